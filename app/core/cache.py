@@ -1,29 +1,234 @@
-from aiocache import cached
-from aiocache.serializers import PickleSerializer
-from typing import Any, Callable
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+import asyncio
 import logging
+import time
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.core.rate_limiter import RequestPriority, request_priority
+from app.core.redis_cache import RedisCache
+from app.exceptions.currency_exceptions import BudaAPIError, CurrencyNotFoundError
 
 logger = logging.getLogger(__name__)
 
-def cache_response(ttl: int = 300):  # 5 minutos por defecto
+# Errores ante los que se puede servir el último valor bueno (stale-if-error),
+# incluido CircuitOpenError cuando el circuit breaker rechaza la llamada
+STALE_IF_ERROR_EXCEPTIONS = (BudaAPIError,)
+
+# Marca de una entrada negativa (mercado inexistente); es JSON para el caché compartido
+NEGATIVE_CACHE_KEY = "$not_found"
+
+# Antigüedad máxima de los datos obsoletos servidos en el contexto actual
+_staleness: ContextVar[Optional[Dict[str, float]]] = ContextVar("cache_staleness", default=None)
+
+
+def track_staleness() -> Dict[str, float]:
+    """
+    Inicia el registro de datos obsoletos servidos en el contexto actual.
+    El diccionario retornado tendrá la clave "max_age" si algún valor se
+    sirvió después de su TTL.
+    """
+    tracker: Dict[str, float] = {}
+    _staleness.set(tracker)
+    return tracker
+
+
+def _record_stale(age: float) -> None:
+    tracker = _staleness.get()
+    if tracker is not None:
+        tracker["max_age"] = max(tracker.get("max_age", 0.0), age)
+
+
+class LRUCache:
+    """
+    Caché en memoria del proceso que guarda los objetos sin serializar.
+    Expulsa la entrada menos usada al superar max_entries.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Retorna (valor, stored_at) o None si la clave no existe o expiró.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, stored_at, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value, stored_at
+
+    async def set(self, key: Hashable, value: Any, stored_at: float, ttl: float) -> None:
+        """
+        Guarda un valor que se retiene ttl segundos desde stored_at.
+        """
+        self._entries[key] = (value, stored_at, stored_at + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+def create_cache() -> Any:
+    """
+    Crea el backend de caché configurado en settings.cache_backend:
+    "memory" (LRU en el proceso) o "redis" (compartido entre workers).
+    """
+    if settings.cache_backend == "redis":
+        return RedisCache(
+            settings.cache_redis_url,
+            prefix=settings.cache_redis_prefix,
+            pool_size=settings.cache_redis_pool_size,
+            timeout=settings.cache_redis_timeout
+        )
+    return LRUCache(max_entries=settings.cache_max_entries)
+
+
+def _is_negative(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and NEGATIVE_CACHE_KEY in value
+
+
+def cache_response(ttl: int = 300, stale_ttl: int = 0, stale_if_error: int = 0, negative_ttl: int = 0):  # 5 minutos por defecto
     """
     Decorador para cachear respuestas de funciones asíncronas.
-    
+
     Args:
         ttl: Tiempo de vida del caché en segundos
+        stale_ttl: Ventana tras el TTL en la que se sirve el valor expirado
+            mientras una tarea en segundo plano lo refresca
+        stale_if_error: Ventana tras el TTL en la que se sirve el último valor
+            bueno si la llamada falla por errores de Buda o circuito abierto
+        negative_ttl: Tiempo durante el que se recuerda un CurrencyNotFoundError
+            y se relanza sin llamar a Buda (0 lo deshabilita)
+
+    La función decorada acepta `cache_read=False` para ignorar el valor
+    cacheado y forzar una llamada que actualice el caché.
+
+    Si la función es un método de un objeto con atributo `cache` (como
+    BudaService), se usa ese caché y la clave es (método, argumentos) sin
+    la instancia; si no, se usa un LRUCache propio de la función.
     """
     def decorator(func: Callable) -> Callable:
-        @cached(
-            ttl=ttl,
-            serializer=PickleSerializer(),
-            key_builder=lambda *args, **kwargs: f"{func.__name__}:{str(args)}:{str(kwargs)}"
-        )
-        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        default_cache = LRUCache()
+        retention = ttl + max(stale_ttl, stale_if_error)
+        refreshing: Set[Hashable] = set()
+        background_tasks: Set[asyncio.Task] = set()
+
+        def resolve(args: Any, kwargs: Any) -> Tuple[Any, Hashable]:
+            owner_cache = getattr(args[0], "cache", None) if args else None
+            if owner_cache is not None:
+                key_args = args[1:]
+            else:
+                owner_cache, key_args = default_cache, args
+            key = (func.__name__, *key_args)
+            if kwargs:
+                key += tuple(sorted(kwargs.items()))
+            return owner_cache, key
+
+        async def load(cache: Any, key: Hashable, args: Any, kwargs: Any) -> Any:
+            try:
+                value = await func(*args, **kwargs)
+            except CurrencyNotFoundError as e:
+                if negative_ttl > 0:
+                    marker = {NEGATIVE_CACHE_KEY: {"message": e.message, "details": e.details}}
+                    await cache.set(key, marker, time.time(), negative_ttl)
+                raise
+            await cache.set(key, value, time.time(), retention)
+            return value
+
+        async def refresh(cache: Any, key: Hashable, args: Any, kwargs: Any) -> None:
             try:
-                return await func(*args, **kwargs)
+                # Quien pidió el dato ya recibió el valor obsoleto: la revalidación no es urgente
+                with request_priority(RequestPriority.BACKGROUND):
+                    await load(cache, key, args, kwargs)
+            except Exception as e:
+                logger.warning(f"Error al revalidar {func.__name__} en segundo plano: {str(e)}")
+            finally:
+                refreshing.discard((id(cache), key))
+
+        def revalidate(cache: Any, key: Hashable, args: Any, kwargs: Any) -> None:
+            # Una sola revalidación por clave a la vez
+            if (id(cache), key) in refreshing:
+                return
+            refreshing.add((id(cache), key))
+            task = asyncio.create_task(refresh(cache, key, args, kwargs))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+
+        @wraps(func)
+        async def wrapper(*args: Any, cache_read: bool = True, **kwargs: Any) -> Any:
+            cache, key = resolve(args, kwargs)
+            entry = await cache.get(key) if cache_read else None
+            if entry is not None:
+                value, stored_at = entry
+                if _is_negative(value):
+                    # El backend expira la entrada negativa tras negative_ttl
+                    CACHE_REQUESTS.inc(func.__name__, "negative_hit")
+                    error = value[NEGATIVE_CACHE_KEY]
+                    raise CurrencyNotFoundError(error["message"], dict(error["details"]))
+                age = time.time() - stored_at
+                if age < ttl:
+                    CACHE_REQUESTS.inc(func.__name__, "hit")
+                    return value
+                if age < ttl + stale_ttl:
+                    revalidate(cache, key, args, kwargs)
+                    _record_stale(age)
+                    CACHE_REQUESTS.inc(func.__name__, "stale")
+                    return value
+
+            CACHE_REQUESTS.inc(func.__name__, "miss")
+            try:
+                return await load(cache, key, args, kwargs)
+            except STALE_IF_ERROR_EXCEPTIONS as e:
+                if entry is not None and time.time() - stored_at < ttl + stale_if_error:
+                    age = time.time() - stored_at
+                    logger.warning(
+                        f"Sirviendo valor obsoleto de {func.__name__} ({age:.0f}s) tras error: {str(e)}"
+                    )
+                    _record_stale(age)
+                    CACHE_REQUESTS.inc(func.__name__, "stale_error")
+                    return value
+                logger.error(f"Error en función cacheada {func.__name__}: {str(e)}")
+                raise
             except Exception as e:
                 logger.error(f"Error en función cacheada {func.__name__}: {str(e)}")
                 raise
 
+        wrapper.cache = default_cache
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
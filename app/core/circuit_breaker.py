@@ -1,36 +1,214 @@
-import pybreaker
+from collections import deque
 from functools import wraps
-from typing import Callable, Any
+from typing import Any, Callable, Deque, Dict, Hashable, Tuple
 import logging
+import time
 from app.core.config import settings
+from app.core.metrics import CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_TRANSITIONS
+from app.exceptions.currency_exceptions import BudaAPIError, CircuitOpenError, CurrencyException, UpstreamRateLimitError
 
 logger = logging.getLogger(__name__)
 
-class BudaCircuitBreaker(pybreaker.CircuitBreaker):
-    """Circuit breaker específico para la API de Buda."""
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half-open"
+STATE_OPEN = "open"
+
+# Valor del gauge circuit_breaker_state por estado
+STATE_VALUES = {
+    STATE_CLOSED: 0,
+    STATE_HALF_OPEN: 1,
+    STATE_OPEN: 2
+}
+
+
+def _is_failure(exc: BaseException) -> bool:
+    """
+    Cuenta como fallo lo que indica que Buda no responde bien. Las respuestas
+    válidas de Buda (mercado inexistente, errores de validación) y los límites
+    de llamadas, que ya pausa UpstreamRateLimiter, no abren el circuito.
+    """
+    if isinstance(exc, UpstreamRateLimitError):
+        return False
+    if isinstance(exc, BudaAPIError):
+        return True
+    return isinstance(exc, Exception) and not isinstance(exc, (CurrencyException, ValueError, TypeError))
+
+
+class _Circuit:
+    """Estado del circuito de una clave (mercado o endpoint)."""
+    __slots__ = ("state", "opened_at", "window", "failures", "probes")
+
     def __init__(self):
-        super().__init__(
-            fail_max=settings.circuit_breaker_failure_threshold,
-            reset_timeout=settings.circuit_breaker_recovery_timeout,
-            exclude=[ValueError, TypeError]  # Excepciones que no cuentan como fallos
-        )
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        # (timestamp, fallo) de las llamadas dentro de la ventana deslizante
+        self.window: Deque[Tuple[float, bool]] = deque()
+        self.failures = 0
+        self.probes = 0
+
+
+class AsyncCircuitBreaker:
+    """
+    Circuit breaker nativo de asyncio con estado independiente por clave.
+
+    - Cerrado: registra el resultado de cada llamada en una ventana deslizante
+      de `window` segundos y abre el circuito cuando hay al menos
+      `failure_threshold` fallos y la tasa de fallos alcanza `failure_rate`.
+    - Abierto: rechaza de inmediato con CircuitOpenError durante
+      `recovery_timeout` segundos.
+    - Semiabierto: deja pasar como máximo `half_open_max_calls` llamadas de
+      prueba concurrentes; el resto falla de inmediato (y cache_response puede
+      servir el valor obsoleto). Una prueba exitosa cierra el circuito y un
+      fallo lo vuelve a abrir.
+
+    Todo corre en el event loop, así que no necesita locks.
+    """
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        failure_rate: float = 0.5,
+        window: float = 60.0,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.window = window
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._circuits: Dict[Hashable, _Circuit] = {}
+
+    def _label(self, key: Hashable) -> str:
+        return f"{self.name}:{key}"
+
+    def _transition(self, key: Hashable, circuit: _Circuit, state: str) -> None:
+        old_state = circuit.state
+        circuit.state = state
+        if state == STATE_OPEN:
+            circuit.opened_at = time.monotonic()
+        elif state == STATE_CLOSED:
+            circuit.window.clear()
+            circuit.failures = 0
+        CIRCUIT_BREAKER_TRANSITIONS.inc(self._label(key), old_state, state)
+        CIRCUIT_BREAKER_STATE.set(self._label(key), value=STATE_VALUES[state])
+        log = logger.warning if state == STATE_OPEN else logger.info
+        log(f"Circuit breaker {self._label(key)}: {old_state} -> {state}")
+
+    def state(self, key: Hashable) -> str:
+        """Estado actual del circuito de una clave (sin efectos secundarios)."""
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            return STATE_CLOSED
+        if circuit.state == STATE_OPEN and time.monotonic() - circuit.opened_at >= self.recovery_timeout:
+            return STATE_HALF_OPEN
+        return circuit.state
+
+    def _trim(self, circuit: _Circuit, now: float) -> None:
+        window = circuit.window
+        while window and now - window[0][0] > self.window:
+            _, failed = window.popleft()
+            circuit.failures -= failed
+
+    def _before_call(self, key: Hashable) -> Tuple[_Circuit, bool]:
+        """
+        Rechaza la llamada si el circuito está abierto y retorna (circuito, es_prueba).
+        """
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit()
+
+        if circuit.state == STATE_OPEN:
+            remaining = self.recovery_timeout - (time.monotonic() - circuit.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"Circuito abierto para {key}; reintento en {remaining:.0f}s",
+                    {"circuit": str(key), "retry_after": round(remaining, 3)}
+                )
+            self._transition(key, circuit, STATE_HALF_OPEN)
+            circuit.probes = 0
+
+        if circuit.state == STATE_HALF_OPEN:
+            if circuit.probes >= self.half_open_max_calls:
+                raise CircuitOpenError(
+                    f"Circuito semiabierto para {key}; prueba en curso",
+                    {"circuit": str(key)}
+                )
+            circuit.probes += 1
+            return circuit, True
+        return circuit, False
+
+    def _record(self, key: Hashable, circuit: _Circuit, probe: bool, failed: bool) -> None:
+        if probe:
+            circuit.probes -= 1
+            if circuit.state == STATE_HALF_OPEN:
+                self._transition(key, circuit, STATE_OPEN if failed else STATE_CLOSED)
+            return
+        # Llamadas iniciadas antes de abrirse el circuito no cambian su estado
+        if circuit.state != STATE_CLOSED:
+            return
+
+        now = time.monotonic()
+        circuit.window.append((now, failed))
+        circuit.failures += failed
+        self._trim(circuit, now)
+        if (
+            failed
+            and circuit.failures >= self.failure_threshold
+            and circuit.failures / len(circuit.window) >= self.failure_rate
+        ):
+            self._transition(key, circuit, STATE_OPEN)
+
+    async def call(self, key: Hashable, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Ejecuta func(*args, **kwargs) protegida por el circuito de `key`.
+        """
+        circuit, probe = self._before_call(key)
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self._record(key, circuit, probe, _is_failure(e))
+            raise
+        except BaseException:
+            # Llamada cancelada: liberar el cupo de prueba sin decidir el estado
+            if probe:
+                circuit.probes -= 1
+            raise
+        self._record(key, circuit, probe, False)
+        return result
+
+    def reset(self) -> None:
+        """Olvida el estado de todos los circuitos."""
+        self._circuits.clear()
+
 
-# Instancia global del circuit breaker
-buda_breaker = BudaCircuitBreaker()
+# Instancia global del circuit breaker (un circuito por mercado o endpoint)
+buda_breaker = AsyncCircuitBreaker(
+    "buda",
+    failure_threshold=settings.circuit_breaker_failure_threshold,
+    failure_rate=settings.circuit_breaker_failure_rate,
+    window=settings.circuit_breaker_window,
+    recovery_timeout=settings.circuit_breaker_recovery_timeout,
+    half_open_max_calls=settings.circuit_breaker_half_open_max_calls
+)
 
 def circuit_breaker(func: Callable) -> Callable:
     """
-    Decorador para aplicar el circuit breaker a funciones asíncronas.
+    Decorador para aplicar el circuit breaker a métodos asíncronos de BudaService.
+    El circuito es por mercado (primer argumento tras la instancia) o, si el
+    método no recibe mercado, por nombre del método.
     """
     @wraps(func)
     async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = args[1] if len(args) > 1 else func.__name__
         try:
-            return await buda_breaker(func)(*args, **kwargs)
-        except pybreaker.CircuitBreakerError as e:
-            logger.error(f"Circuit breaker abierto: {str(e)}")
+            return await buda_breaker.call(key, func, *args, **kwargs)
+        except CircuitOpenError as e:
+            logger.debug(f"Circuit breaker abierto: {str(e)}")
             raise
         except Exception as e:
             logger.error(f"Error en la llamada: {str(e)}")
             raise
 
-    return wrapper 
\ No newline at end of file
+    return wrapper
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -10,14 +10,89 @@ class Settings(BaseSettings):
     
     # Configuración de Buda API
     buda_api_url: str = "https://www.buda.com/api/v2"
-    request_timeout: float = 10.0
+    request_timeout: float = 10.0  # Presupuesto total de una llamada a Buda, incluidos reintentos
     max_connections: int = 10
     max_keepalive_connections: int = 5
     
+    # Configuración del límite de llamadas a Buda (presupuesto compartido por todas las llamadas)
+    buda_rate_limit_enabled: bool = True
+    buda_rate_limit_rate: float = 10.0  # Llamadas por segundo
+    buda_rate_limit_burst: float = 20.0
+    buda_rate_limit_max_wait: float = 2.0  # Espera máxima por un turno antes de fallar
+    
+    # Configuración de reintentos y hedging hacia Buda
+    buda_attempt_timeout: float = 4.0  # Timeout de cada intento individual
+    buda_retry_attempts: int = 2  # Reintentos ante errores transitorios (timeouts, conexión, 429, 5xx)
+    buda_retry_backoff_base: float = 0.1  # Backoff exponencial con jitter: uniforme(0, base * 2^intento)
+    buda_retry_backoff_max: float = 1.0
+    buda_retry_min_attempt_time: float = 0.5  # No reintentar si queda menos de este tiempo del presupuesto total
+    buda_hedging_enabled: bool = True  # Lanzar una petición duplicada si la primera tarda más que el percentil (solo llamadas de usuarios)
+    buda_hedge_percentile: float = 0.95
+    buda_hedge_min_samples: int = 20  # Muestras de latencia necesarias antes de hacer hedging
+    buda_hedge_min_delay: float = 0.05  # Espera mínima antes de lanzar la petición duplicada
+    
+    # Configuración de conversión
+    concurrent_route_evaluation: bool = True  # Consultar todas las patas en paralelo
+    use_bulk_tickers: bool = True  # Leer precios desde /tickers en una sola petición
+    use_rate_matrix: bool = True  # Precalcular la mejor ruta por par con cada tabla de precios
+    batch_max_items: int = 1000  # Máximo de conversiones por solicitud batch
+    stream_max_line_bytes: int = 65536  # Largo máximo de una línea en /convert/stream
+    route_engine: Literal["fixed", "graph"] = "fixed"  # graph: rutas de varios saltos sobre todos los mercados
+    route_max_hops: int = 3  # Máximo de mercados por ruta en el motor graph
+    pricing_mode: Literal["last_price", "order_book"] = "last_price"  # order_book: monto ejecutable según profundidad
+    
+    # Configuración de streaming de tasas (/rates/stream)
+    rate_stream_interval: float = 5.0  # Recalcular tasas al menos cada N segundos aunque no llegue una tabla nueva
+    rate_stream_queue_size: int = 16  # Eventos pendientes por suscriptor antes de descartar los más antiguos
+    rate_stream_keepalive: float = 15.0  # Comentario SSE si no hubo eventos en N segundos
+    rate_stream_max_pairs: int = 6  # Pares por suscripción
+    
+    # Configuración de control de admisión (se lee en cada solicitud)
+    admission_enabled: bool = True
+    admission_rate: float = 50.0  # Solicitudes por segundo por cliente
+    admission_burst: float = 100.0  # Ráfaga máxima por cliente
+    admission_max_clients: int = 10000  # Buckets de clientes retenidos (LRU)
+    admission_trust_forwarded: bool = False  # Identificar al cliente por X-Forwarded-For (detrás de un proxy)
+    admission_max_in_flight: int = 100  # Solicitudes en curso antes de encolar
+    admission_max_queue: int = 200  # Solicitudes en espera antes de descartar
+    admission_max_queue_time: float = 0.5  # Espera máxima en la cola antes de responder 503
+    admission_retry_after: float = 1.0  # Retry-After de las respuestas 503 por sobrecarga
+    
+    # Configuración de serialización
+    fast_json_responses: bool = True  # Serializar respuestas sin revalidar contra response_model
+
     # Configuración de caché
     cache_ttl_ticker: int = 60  # 1 minuto para tickers
     cache_ttl_markets: int = 300  # 5 minutos para mercados
+    cache_ttl_order_book: int = 10  # 10 segundos para libros de órdenes
+    cache_stale_ttl: int = 30  # Ventana para servir datos expirados mientras se revalidan
+    cache_stale_if_error_ttl: int = 300  # Ventana para servir datos expirados si Buda falla
+    cache_negative_ttl: int = 300  # Tiempo que se recuerda un mercado inexistente (404) sin volver a consultarlo
+    cache_max_entries: int = 1024  # Máximo de entradas en el caché en memoria
+    cache_backend: Literal["memory", "redis"] = "memory"
+    cache_redis_url: str = "redis://localhost:6379/0"
+    cache_redis_prefix: str = "buda:"
+    cache_redis_pool_size: int = 4
+    cache_redis_timeout: float = 1.0
+    
+    # Configuración de refresco de precios en segundo plano
+    price_refresh_enabled: bool = True
+    price_refresh_interval: float = 45.0  # Debe ser menor que cache_ttl_ticker
+    price_refresh_jitter: float = 5.0
+    
+    # Configuración del registro de mercados
+    market_registry_enabled: bool = True  # Cargar monedas y rutas desde /markets en lugar de los enums
+    market_registry_refresh_interval: float = 300.0
     
+    # Configuración de health checks
+    health_check_interval: float = 15.0  # Chequeo en segundo plano de Buda y del caché
+    health_max_upstream_age: float = 60.0  # Antigüedad máxima de la última respuesta exitosa de Buda
+
+    # Configuración de instrumentación (se lee en cada solicitud)
+    server_timing_enabled: bool = False  # Agregar el header Server-Timing con los spans de la solicitud
+    profiling_sample_rate: float = 0.0  # Fracción de solicitudes perfiladas con cProfile
+    profiling_dump_dir: str = "profiles"
+
     # Configuración de logging
     log_level: str = "INFO"
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -27,8 +102,11 @@ class Settings(BaseSettings):
     port: int = 8000
     
     # Configuración de circuit breaker
-    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_failure_threshold: int = 5  # Fallos mínimos en la ventana para abrir el circuito
+    circuit_breaker_failure_rate: float = 0.5  # Tasa de fallos en la ventana para abrir el circuito
+    circuit_breaker_window: float = 60.0  # Ventana deslizante en segundos
     circuit_breaker_recovery_timeout: int = 30
+    circuit_breaker_half_open_max_calls: int = 1  # Llamadas de prueba concurrentes en semiabierto
     circuit_breaker_expected_exception: tuple = (Exception,)
     
     class Config:
@@ -1,11 +1,17 @@
 from app.services.buda_service import BudaService
 from app.services.conversion_service import ConversionService
 from app.services.health_service import HealthService
+from app.services.market_registry import MarketRegistryRefresher
+from app.services.price_refresher import PriceRefresher
+from app.services.rate_stream import RateBroadcaster
 
 # Servicios singleton
 _buda_service = None
 _conversion_service = None
 _health_service = None
+_price_refresher = None
+_rate_broadcaster = None
+_market_registry_refresher = None
 
 def get_buda_service() -> BudaService:
     """Obtiene la instancia singleton del servicio de Buda."""
@@ -28,8 +34,37 @@ def get_health_service() -> HealthService:
         _health_service = HealthService(get_buda_service())
     return _health_service
 
+def get_price_refresher() -> PriceRefresher:
+    """Obtiene la instancia singleton del refresco de precios en segundo plano."""
+    global _price_refresher
+    if _price_refresher is None:
+        _price_refresher = PriceRefresher(get_buda_service())
+    return _price_refresher
+
+def get_rate_broadcaster() -> RateBroadcaster:
+    """Obtiene la instancia singleton de la difusión de tasas en vivo."""
+    global _rate_broadcaster
+    if _rate_broadcaster is None:
+        _rate_broadcaster = RateBroadcaster(get_conversion_service())
+    return _rate_broadcaster
+
+def get_market_registry_refresher() -> MarketRegistryRefresher:
+    """Obtiene la instancia singleton de la recarga del registro de mercados."""
+    global _market_registry_refresher
+    if _market_registry_refresher is None:
+        _market_registry_refresher = MarketRegistryRefresher(get_buda_service())
+    return _market_registry_refresher
+
 async def cleanup_services():
     """Limpia los servicios al cerrar la aplicación."""
     global _buda_service
+    if _rate_broadcaster:
+        await _rate_broadcaster.stop()
+    if _price_refresher:
+        await _price_refresher.stop()
+    if _market_registry_refresher:
+        await _market_registry_refresher.stop()
+    if _health_service:
+        await _health_service.stop()
     if _buda_service:
         await _buda_service.close()
@@ -0,0 +1,38 @@
+from typing import Optional
+import time
+
+
+class HealthState:
+    """
+    Estado de salud mantenido continuamente en memoria.
+
+    BudaService lo actualiza con cada llamada real a Buda y el chequeo en
+    segundo plano de HealthService con el ping al caché, de modo que el
+    readiness probe es una lectura O(1) sin tráfico hacia Buda.
+    """
+    def __init__(self):
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.cache_alive: Optional[bool] = None
+        self.cache_checked_at: Optional[float] = None
+
+    def record_success(self) -> None:
+        self.last_success_at = time.time()
+        self.consecutive_failures = 0
+
+    def record_failure(self, error: str) -> None:
+        self.last_failure_at = time.time()
+        self.last_error = error
+        self.consecutive_failures += 1
+
+    def record_cache(self, alive: bool) -> None:
+        self.cache_alive = alive
+        self.cache_checked_at = time.time()
+
+    def upstream_age(self) -> Optional[float]:
+        """Segundos desde la última respuesta exitosa de Buda, o None si nunca la hubo."""
+        if self.last_success_at is None:
+            return None
+        return time.time() - self.last_success_at
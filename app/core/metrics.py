@@ -0,0 +1,154 @@
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Buckets de latencia en segundos, del camino en caché (sub-ms) a Buda lento
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Contador monótono por combinación de etiquetas.
+
+    Las métricas se actualizan solo desde el event loop, así que basta con
+    operaciones simples sobre diccionarios, sin locks.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Valor que puede subir y bajar por combinación de etiquetas."""
+    kind = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+    def dec(self, *labels: str, value: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - value
+
+
+class Histogram(_Metric):
+    """
+    Histograma con buckets fijos. Cada serie guarda los conteos por bucket
+    (no acumulados) más la suma y el total; se acumulan al exportar.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            # len(buckets) + 1 conteos (el último es +Inf), suma y total
+            series = self.series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Exporta todas las métricas en el formato de texto de Prometheus."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# Métricas de la aplicación
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Solicitudes HTTP atendidas", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latencia de las solicitudes HTTP", ("method", "route")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Solicitudes HTTP en curso"
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "Solicitudes rechazadas por control de admisión", ("reason",)
+)
+BUDA_REQUESTS = Counter(
+    "buda_requests_total", "Llamadas a la API de Buda por resultado", ("endpoint", "market", "outcome")
+)
+BUDA_REQUEST_DURATION = Histogram(
+    "buda_request_duration_seconds", "Latencia de las llamadas a la API de Buda", ("endpoint", "market")
+)
+BUDA_RETRIES = Counter(
+    "buda_retries_total", "Peticiones adicionales a Buda por tipo (retry, hedge)", ("endpoint", "kind")
+)
+BUDA_RATE_LIMIT_WAIT = Histogram(
+    "buda_rate_limit_wait_seconds", "Espera por presupuesto de llamadas a Buda por prioridad", ("priority",)
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Lecturas de caché por resultado (hit, stale, stale_error, negative_hit, miss)", ("function", "result")
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state", "Estado del circuit breaker (0 cerrado, 1 semiabierto, 2 abierto)", ("breaker",)
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total", "Cambios de estado del circuit breaker", ("breaker", "from_state", "to_state")
+)
+HTTP_REQUESTS_IN_FLIGHT.set(value=0)
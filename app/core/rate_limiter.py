@@ -0,0 +1,218 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Iterator, List, Mapping, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from app.core.metrics import BUDA_RATE_LIMIT_WAIT
+from app.exceptions.currency_exceptions import UpstreamRateLimitError
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket: se recargan `rate` tokens por segundo hasta `capacity`.
+
+    No usa locks ni tareas: los tokens se recalculan al consultarlo, así que
+    mantener miles de buckets inactivos no tiene costo.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0, now: Optional[float] = None) -> bool:
+        """Consume tokens si hay suficientes; retorna si se pudo."""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Segundos hasta que haya `tokens` disponibles (0 si ya los hay)."""
+        self._refill(time.monotonic() if now is None else now)
+        missing = tokens - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else float("inf")
+
+
+class RequestPriority(IntEnum):
+    """Prioridad de las llamadas a Buda; un valor menor se atiende antes."""
+    USER = 0
+    BACKGROUND = 1
+    HEALTH = 2
+
+
+# Prioridad de las llamadas a Buda hechas desde el contexto actual. Las tareas
+# creadas desde un contexto (asyncio.gather, create_task) la heredan.
+_priority: ContextVar[RequestPriority] = ContextVar("request_priority", default=RequestPriority.USER)
+
+
+def current_priority() -> RequestPriority:
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority: RequestPriority) -> Iterator[None]:
+    """Fija la prioridad de las llamadas a Buda dentro del bloque."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _header_seconds(value: str) -> Optional[float]:
+    """Segundos de un header Retry-After/RateLimit-Reset (segundos, timestamp o fecha HTTP)."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        # X-RateLimit-Reset suele ser un timestamp Unix en lugar de segundos restantes
+        if seconds > 1e9:
+            seconds -= time.time()
+        return max(seconds, 0.0)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class UpstreamRateLimiter:
+    """
+    Gobernador del presupuesto de llamadas a Buda.
+
+    Un token bucket con el límite configurado; cuando no hay tokens las
+    llamadas esperan en una cola ordenada por RequestPriority (y por orden de
+    llegada dentro de cada prioridad), de modo que las conversiones de los
+    usuarios pasan antes que el refresco en segundo plano y los health checks.
+    Una llamada que espera más de `max_wait` falla con UpstreamRateLimitError.
+
+    Los headers RateLimit-Remaining / X-RateLimit-Remaining, RateLimit-Reset /
+    X-RateLimit-Reset y Retry-After de las respuestas ajustan el presupuesto:
+    sin llamadas restantes o ante un 429 se pausa hasta el reset indicado.
+    """
+    REMAINING_HEADERS = ("ratelimit-remaining", "x-ratelimit-remaining")
+    RESET_HEADERS = ("ratelimit-reset", "x-ratelimit-reset")
+
+    def __init__(self, rate: float, burst: float, max_wait: float, enabled: bool = True):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self._blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(self, priority: Optional[RequestPriority] = None) -> None:
+        """
+        Espera un token para llamar a Buda según la prioridad del contexto.
+        """
+        if not self.enabled:
+            return
+        priority = current_priority() if priority is None else priority
+        now = time.monotonic()
+        if not self._waiters and now >= self._blocked_until and self.bucket.try_acquire(now=now):
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                raise UpstreamRateLimitError(
+                    f"Presupuesto de llamadas a Buda agotado tras esperar {self.max_wait}s",
+                    {"priority": priority.name.lower()}
+                )
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            BUDA_RATE_LIMIT_WAIT.observe(time.monotonic() - now, priority.name.lower())
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            waiter = self._waiters[0][2]
+            if waiter.done():
+                # Espera cancelada o vencida
+                heapq.heappop(self._waiters)
+                continue
+            now = time.monotonic()
+            delay = max(self._blocked_until - now, self.bucket.wait_time(now=now))
+            if delay > 0:
+                # Tras dormir se vuelve a mirar el primero: puede haber llegado uno más
+                # prioritario, o todas las esperas pueden haber vencido
+                await asyncio.sleep(min(delay, self.max_wait))
+                continue
+            if self.bucket.try_acquire(now=now):
+                heapq.heappop(self._waiters)
+                waiter.set_result(None)
+
+    async def close(self) -> None:
+        """
+        Detiene el despacho de esperas pendientes.
+        """
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        self._dispatcher = None
+
+    def update(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """
+        Ajusta el presupuesto según los headers de límite de una respuesta de Buda.
+        """
+        if not self.enabled:
+            return
+        reset = None
+        for name in self.RESET_HEADERS:
+            value = headers.get(name)
+            if isinstance(value, str):
+                reset = _header_seconds(value)
+                break
+
+        for name in self.REMAINING_HEADERS:
+            value = headers.get(name)
+            if not isinstance(value, str):
+                continue
+            try:
+                remaining = int(value)
+            except ValueError:
+                break
+            # No gastar más de lo que Buda dice que queda
+            self.bucket.tokens = min(self.bucket.tokens, remaining)
+            if remaining <= 0:
+                self._block(reset if reset is not None else 1.0)
+            break
+
+        if status_code == 429:
+            retry_after = headers.get("retry-after")
+            delay = _header_seconds(retry_after) if isinstance(retry_after, str) else None
+            self._block(delay if delay is not None else (reset if reset is not None else 1.0))
+
+    def _block(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if until > self._blocked_until:
+            self._blocked_until = until
+            logger.warning(f"Límite de llamadas de Buda alcanzado; pausando {seconds:.1f}s")
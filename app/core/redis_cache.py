@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class RedisProtocolError(Exception):
+    """Error retornado por el servidor o respuesta RESP inválida."""
+
+
+def _encode_default(value: Any) -> Any:
+    # Los precios se guardan como texto exacto para no perder precisión al pasar por JSON
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    raise TypeError(f"Tipo no serializable en el caché compartido: {type(value).__name__}")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$decimal" in obj:
+        return Decimal(obj["$decimal"])
+    return obj
+
+
+class RedisConnection:
+    """
+    Conexión mínima a un servidor compatible con el protocolo de Redis (RESP).
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def _encode(*parts: Any) -> bytes:
+        chunks = [b"*%d\r\n" % len(parts)]
+        for part in parts:
+            data = part if isinstance(part, bytes) else str(part).encode()
+            chunks.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(chunks)
+
+    async def _read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Conexión cerrada por el servidor de caché")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisProtocolError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RedisProtocolError(f"Respuesta RESP inválida: {line!r}")
+
+    async def execute(self, *parts: Any) -> Any:
+        self.writer.write(self._encode(*parts))
+        await self.writer.drain()
+        return await self._read_reply()
+
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+class RedisCache:
+    """
+    Backend de caché compartido entre procesos sobre un servidor compatible con Redis.
+
+    Implementa la misma interfaz que LRUCache. Los valores se guardan como
+    JSON compacto [stored_at, valor] (los Decimal como {"$decimal": texto})
+    y expiran en el servidor vía PX. Si el
+    servidor no está disponible las lecturas se tratan como fallos de caché
+    para no interrumpir las conversiones.
+    """
+    def __init__(self, url: str, prefix: str = "buda:", pool_size: int = 4, timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._pool: "asyncio.LifoQueue[RedisConnection]" = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return self.prefix + ":".join(str(part) for part in parts)
+
+    async def _connect(self) -> RedisConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = RedisConnection(reader, writer)
+        try:
+            if self.password:
+                await connection.execute("AUTH", self.password)
+            if self.db:
+                await connection.execute("SELECT", self.db)
+        except BaseException:
+            # AUTH/SELECT fallido o conexión cancelada por timeout: no dejar el socket abierto
+            await connection.close()
+            raise
+        return connection
+
+    async def execute(self, *parts: Any) -> Any:
+        """
+        Ejecuta un comando usando una conexión del pool.
+        Las conexiones que fallan se descartan en lugar de volver al pool.
+        """
+        async with self._slots:
+            connection = self._pool.get_nowait() if not self._pool.empty() else None
+            if connection is None:
+                connection = await asyncio.wait_for(self._connect(), timeout=self.timeout)
+            try:
+                result = await asyncio.wait_for(connection.execute(*parts), timeout=self.timeout)
+            except RedisProtocolError:
+                # Error del servidor con la respuesta completa: la conexión sigue siendo usable
+                self._pool.put_nowait(connection)
+                raise
+            except BaseException:
+                await connection.close()
+                raise
+            self._pool.put_nowait(connection)
+            return result
+
+    async def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        try:
+            raw = await self.execute("GET", self._key(key))
+        except Exception as e:
+            self.errors += 1
+            self.misses += 1
+            logger.warning(f"Error al leer del caché compartido: {e}")
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        try:
+            stored_at, value = json.loads(raw, object_hook=_decode_object)
+        except (ValueError, TypeError, ArithmeticError) as e:
+            self.errors += 1
+            self.misses += 1
+            logger.warning(f"Entrada inválida en el caché compartido: {e}")
+            return None
+        self.hits += 1
+        return value, stored_at
+
+    async def set(self, key: Hashable, value: Any, stored_at: float, ttl: float) -> None:
+        data = json.dumps([stored_at, value], separators=(",", ":"), default=_encode_default)
+        try:
+            await self.execute("SET", self._key(key), data, "PX", max(int(ttl * 1000), 1))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Error al escribir en el caché compartido: {e}")
+
+    async def delete(self, key: Hashable) -> None:
+        await self.execute("DEL", self._key(key))
+
+    async def clear(self) -> None:
+        """
+        Elimina las claves del prefijo con SCAN para no bloquear el servidor compartido.
+        """
+        cursor = b"0"
+        while True:
+            cursor, keys = await self.execute("SCAN", cursor, "MATCH", f"{self.prefix}*", "COUNT", 500)
+            if keys:
+                await self.execute("DEL", *keys)
+            if cursor in (b"0", "0"):
+                break
+
+    async def ping(self) -> bool:
+        return await self.execute("PING") == "PONG"
+
+    async def close(self) -> None:
+        while not self._pool.empty():
+            await self._pool.get_nowait().close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
@@ -0,0 +1,66 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+import random
+
+import httpx
+
+# Códigos HTTP ante los que conviene reintentar (saturación o falla transitoria)
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Indica si un error de una petición a Buda es transitorio. Los 4xx (incluido
+    el 404 de un mercado inexistente) son respuestas definitivas.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, httpx.TransportError)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Espera antes del reintento `attempt` (desde 0): backoff exponencial con
+    jitter completo, uniforme entre 0 y min(cap, base * 2^attempt).
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class LatencyTracker:
+    """
+    Latencias recientes de Buda por endpoint, para decidir cuándo lanzar una
+    petición duplicada (hedging).
+
+    Guarda las últimas `window` muestras de cada endpoint y recalcula el
+    percentil solo cada `recompute_every` muestras nuevas, así que consultarlo
+    en cada petición no ordena la ventana.
+    """
+    def __init__(self, window: int = 200, percentile: float = 0.95, min_samples: int = 20, recompute_every: int = 16):
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.recompute_every = recompute_every
+        self._samples: Dict[str, Deque[float]] = {}
+        self._pending: Dict[str, int] = {}
+        self._cached: Dict[str, float] = {}
+
+    def record(self, endpoint: str, latency: float) -> None:
+        samples = self._samples.get(endpoint)
+        if samples is None:
+            samples = self._samples[endpoint] = deque(maxlen=self.window)
+        samples.append(latency)
+        self._pending[endpoint] = self._pending.get(endpoint, 0) + 1
+
+    def value(self, endpoint: str) -> Optional[float]:
+        """
+        Percentil de latencia del endpoint, o None si aún no hay suficientes muestras.
+        """
+        samples = self._samples.get(endpoint)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        if endpoint not in self._cached or self._pending[endpoint] >= self.recompute_every:
+            ordered = sorted(samples)
+            index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+            self._cached[endpoint] = ordered[index]
+            self._pending[endpoint] = 0
+        return self._cached[endpoint]
@@ -0,0 +1,64 @@
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Type, Union
+import json
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    # Mismo formato que Pydantic en modo JSON: Decimal como texto exacto
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def json_dumps(value: Any) -> bytes:
+    """
+    Serializa a JSON compacto con orjson si está instalado, o con json en su defecto.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """
+    Parsea JSON con orjson si está instalado, o con json en su defecto.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse que serializa con json_dumps.
+    """
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+def fast_response(
+    model: Type[BaseModel],
+    content: Dict[str, Any]
+) -> Union[Response, BaseModel]:
+    """
+    Con settings.fast_json_responses serializa directamente un contenido que
+    ya está validado, sin construir el modelo ni revalidarlo contra
+    response_model. Si no, retorna el modelo como antes.
+    """
+    if settings.fast_json_responses:
+        return FastJSONResponse(content)
+    return model(**content)
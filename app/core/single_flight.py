@@ -0,0 +1,39 @@
+import asyncio
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+def single_flight(func: Callable) -> Callable:
+    """
+    Decorador que deduplica llamadas asíncronas concurrentes con los mismos argumentos.
+
+    Mientras exista una llamada en curso para una clave, los demás llamadores
+    esperan el mismo resultado en lugar de lanzar otra petición. La llamada
+    compartida corre en su propia tarea, por lo que cancelar a un llamador no
+    cancela la petición de los demás.
+    """
+    in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = (args, tuple(sorted(kwargs.items())))
+        task = in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            in_flight[key] = task
+
+            def release(done: asyncio.Task) -> None:
+                in_flight.pop(key, None)
+                # Marcar la excepción como consumida aunque todos los llamadores se hayan cancelado
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(release)
+        else:
+            logger.debug(f"Reutilizando llamada en curso de {func.__name__}")
+        return await asyncio.shield(task)
+
+    wrapper.in_flight = in_flight
+    return wrapper
@@ -0,0 +1,70 @@
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+import time
+
+# Duraciones acumuladas por nombre de span en la solicitud actual: [total_s, veces]
+_spans: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("timing_spans", default=None)
+
+
+def start_timing() -> Dict[str, List[float]]:
+    """
+    Inicia el registro de spans en el contexto actual y retorna el registro.
+    Las tareas creadas desde este contexto (asyncio.gather) comparten el mismo
+    registro, así que los spans concurrentes se acumulan.
+    """
+    spans: Dict[str, List[float]] = {}
+    _spans.set(spans)
+    return spans
+
+
+class span:
+    """
+    Mide un bloque o una corrutina y lo acumula bajo `name`.
+
+    Se usa como context manager (`with span("validate"):`) o como decorador
+    de funciones asíncronas. Si no hay registro activo (Server-Timing y
+    profiling deshabilitados) el costo es una lectura de ContextVar.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._start: Optional[float] = None
+
+    def __enter__(self) -> "span":
+        if _spans.get() is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._start is None:
+            return
+        spans = _spans.get()
+        if spans is not None:
+            entry = spans.setdefault(self.name, [0.0, 0])
+            entry[0] += time.perf_counter() - self._start
+            entry[1] += 1
+        self._start = None
+
+    def __call__(self, func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # Un span nuevo por llamada: las llamadas concurrentes no comparten _start
+            with span(self.name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+
+def format_server_timing(spans: Dict[str, List[float]], total: float) -> str:
+    """
+    Formatea los spans como valor del header Server-Timing (duraciones en ms).
+    Los spans que se ejecutaron más de una vez indican las veces en desc.
+    """
+    entries = []
+    for name, (duration, count) in spans.items():
+        entry = f"{name};dur={duration * 1000:.2f}"
+        if count > 1:
+            entry += f';desc="x{count}"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
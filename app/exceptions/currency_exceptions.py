@@ -28,6 +28,16 @@ class BudaAPIError(CurrencyException):
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(message, status_code=503, details=details)
 
+class CircuitOpenError(BudaAPIError):
+    """Error cuando el circuit breaker rechaza la llamada a Buda sin intentarla."""
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, details=details)
+
+class UpstreamRateLimitError(BudaAPIError):
+    """Error cuando se agota el presupuesto local de llamadas a Buda."""
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, details=details)
+
 class InvalidAmountError(CurrencyException):
     """Error cuando el monto a convertir es inválido."""
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
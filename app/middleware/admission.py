@@ -0,0 +1,139 @@
+from collections import OrderedDict, deque
+from typing import Deque
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import asyncio
+import logging
+import math
+import time
+from app.core.config import settings
+from app.core.metrics import ADMISSION_REJECTIONS
+from app.core.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Rutas que nunca se limitan: los probes deben responder aunque la API esté saturada
+EXEMPT_PREFIXES = ("/health", "/metrics")
+# Conexiones de larga duración: pasan por el token bucket pero no ocupan un cupo en curso
+LONG_LIVED_PATHS = ("/rates/stream",)
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI de control de admisión.
+
+    - Token bucket por cliente (settings.admission_rate solicitudes por
+      segundo, ráfagas de settings.admission_burst). Los buckets viven en un
+      LRU acotado a settings.admission_max_clients. Sin tokens se responde
+      429 con Retry-After.
+    - Máximo de settings.admission_max_in_flight solicitudes en curso. Las
+      demás esperan en una cola FIFO de hasta settings.admission_max_queue
+      solicitudes; si la cola está llena o la espera supera
+      settings.admission_max_queue_time se responde 503 con Retry-After, en
+      lugar de dejar que todas esperen a Buda hasta el timeout.
+    - /health y /metrics quedan exentos.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @staticmethod
+    def _client_id(scope: Scope) -> str:
+        if settings.admission_trust_forwarded:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _bucket(self, client_id: str) -> TokenBucket:
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(settings.admission_rate, settings.admission_burst)
+            while len(self._buckets) > settings.admission_max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        return bucket
+
+    async def _acquire_slot(self) -> bool:
+        """
+        Ocupa un cupo de solicitud en curso, esperando en la cola si hace falta.
+        Retorna False si la solicitud debe descartarse.
+        """
+        if self._in_flight < settings.admission_max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return True
+        if len(self._waiters) >= settings.admission_max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        admitted = False
+        try:
+            # _release_slot transfiere su cupo al resolver el future
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=settings.admission_max_queue_time)
+            admitted = True
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if not admitted:
+                if waiter.done():
+                    # El cupo llegó al vencer la espera o al cancelarse la solicitud: devolverlo
+                    self._release_slot()
+                else:
+                    waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        return admitted
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, status_code: int, message: str, retry_after: float) -> None:
+        retry_after = max(1, math.ceil(retry_after))
+        response = JSONResponse(
+            status_code=status_code,
+            content={"error": message, "details": {"retry_after": retry_after}, "path": scope["path"]},
+            headers={"Retry-After": str(retry_after)}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.admission_enabled or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        bucket = self._bucket(self._client_id(scope))
+        if not bucket.try_acquire():
+            ADMISSION_REJECTIONS.inc("rate_limited")
+            await self._reject(scope, receive, send, 429, "Demasiadas solicitudes", bucket.wait_time())
+            return
+
+        if scope["path"] in LONG_LIVED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        if not await self._acquire_slot():
+            ADMISSION_REJECTIONS.inc("overloaded")
+            logger.warning(
+                f"Solicitud descartada por sobrecarga tras {time.perf_counter() - start:.3f}s "
+                f"({self._in_flight} en curso, {len(self._waiters)} en cola)"
+            )
+            await self._reject(scope, receive, send, 503, "Servicio sobrecargado", settings.admission_retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._release_slot()
@@ -1,38 +1,76 @@
-from fastapi import Request, status
+from fastapi import status
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.exceptions.currency_exceptions import CurrencyException
 import logging
 import traceback
-from typing import Union
 
 logger = logging.getLogger(__name__)
 
-async def error_handler_middleware(request: Request, call_next):
-    try:
-        return await call_next(request)
-    except CurrencyException as e:
-        logger.error(f"Currency error: {str(e)}", extra={
-            "status_code": e.status_code,
-            "details": e.details,
-            "path": request.url.path
+
+def _error_response(exc: Exception, path: str) -> JSONResponse:
+    if isinstance(exc, CurrencyException):
+        logger.error(f"Currency error: {str(exc)}", extra={
+            "status_code": exc.status_code,
+            "details": exc.details,
+            "path": path
         })
         return JSONResponse(
-            status_code=e.status_code,
+            status_code=exc.status_code,
             content={
-                "error": e.message,
-                "details": e.details,
-                "path": request.url.path
+                "error": exc.message,
+                "details": jsonable_encoder(exc.details),
+                "path": path
             }
         )
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}", extra={
-            "traceback": traceback.format_exc(),
-            "path": request.url.path
-        })
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
-                "error": "Internal server error",
-                "path": request.url.path
-            }
-        ) 
\ No newline at end of file
+
+    logger.error(f"Unexpected error: {str(exc)}", extra={
+        "traceback": traceback.format_exc(),
+        "path": path
+    })
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={
+            "error": "Internal server error",
+            "path": path
+        }
+    )
+
+
+class ErrorHandlerMiddleware:
+    """
+    Middleware ASGI que convierte las excepciones en respuestas JSON.
+
+    Es ASGI puro (no BaseHTTPMiddleware) para no envolver las respuestas en
+    otro StreamingResponse: así los endpoints de streaming pueden leer el
+    cuerpo de la solicitud mientras responden.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            if response_started:
+                # La respuesta ya comenzó; solo queda registrar el error
+                logger.error(f"Error after response started: {str(e)}", extra={
+                    "traceback": traceback.format_exc(),
+                    "path": scope["path"]
+                })
+                raise
+            response = _error_response(e, scope["path"])
+            await response(scope, receive, send)
@@ -0,0 +1,74 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from app.core.config import settings
+from app.core.timing import format_server_timing, start_timing
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI de instrumentación opcional.
+
+    Con settings.server_timing_enabled registra los spans de la solicitud y
+    los agrega en el header Server-Timing. Con settings.profiling_sample_rate
+    > 0 perfila esa fracción de solicitudes con cProfile y guarda el volcado
+    en settings.profiling_dump_dir. Ambos settings se leen en cada
+    solicitud, por lo que pueden cambiarse en caliente.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # cProfile perfila todo el hilo: solo una solicitud perfilada a la vez
+        self._profiling = False
+
+    def _should_profile(self) -> bool:
+        rate = settings.profiling_sample_rate
+        return rate > 0 and not self._profiling and random.random() < rate
+
+    def _dump_profile(self, profiler: cProfile.Profile, scope: Scope) -> None:
+        try:
+            os.makedirs(settings.profiling_dump_dir, exist_ok=True)
+            name = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+            path = os.path.join(settings.profiling_dump_dir, f"{int(time.time() * 1000)}-{name}.prof")
+            profiler.dump_stats(path)
+            logger.info(f"Perfil de {scope['path']} guardado en {path}")
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el perfil: {e}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing_enabled = settings.server_timing_enabled
+        profiler = None
+        if self._should_profile():
+            self._profiling = True
+            profiler = cProfile.Profile()
+        if not timing_enabled and profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        spans = start_timing()
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if timing_enabled and message["type"] == "http.response.start":
+                value = format_server_timing(spans, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                self._dump_profile(profiler, scope)
@@ -1,17 +1,18 @@
 from pydantic import BaseModel, Field, validator
 from decimal import Decimal
-from typing import Literal
-from app.models.currency import FiatCurrency
+from typing import Any, List
+from app.core.config import settings
+from app.services.market_registry import currency_code, get_market_registry
 
 
 class ConversionRequest(BaseModel):
-    from_currency: Literal["CLP", "COP", "PEN"] = Field(
+    from_currency: str = Field(
         ..., 
-        description="Moneda de origen (CLP, COP o PEN)"
+        description="Moneda fiat de origen (por ejemplo CLP, COP o PEN)"
     )
-    to_currency: Literal["CLP", "COP", "PEN"] = Field(
+    to_currency: str = Field(
         ..., 
-        description="Moneda de destino (CLP, COP o PEN)"
+        description="Moneda fiat de destino (por ejemplo CLP, COP o PEN)"
     )
     amount: Decimal = Field(
         ..., 
@@ -27,6 +28,14 @@ class ConversionRequest(BaseModel):
             raise ValueError('El monto no puede tener más de 8 decimales')
         return v
     
+    @validator('from_currency', 'to_currency')
+    def validate_supported_currency(cls, v):
+        """Validar que la moneda sea una fiat del registro de mercados"""
+        registry = get_market_registry()
+        if not registry.is_fiat(v):
+            raise ValueError(f'Moneda {v} no soportada. Monedas válidas: {", ".join(sorted(registry.fiats))}')
+        return currency_code(v)
+    
     @validator('to_currency')
     def validate_different_currencies(cls, v, values):
         """Validar que las monedas de origen y destino sean diferentes"""
@@ -34,15 +43,6 @@ class ConversionRequest(BaseModel):
             raise ValueError('Las monedas de origen y destino deben ser diferentes')
         return v
     
-    @validator('from_currency', 'to_currency')
-    def validate_supported_currency(cls, v):
-        """Validar que la moneda esté soportada"""
-        try:
-            FiatCurrency(v)
-        except ValueError:
-            raise ValueError(f'Moneda {v} no soportada. Monedas válidas: CLP, COP, PEN')
-        return v
-    
     class Config:
         schema_extra = {
             "example": {
@@ -50,4 +50,24 @@ class ConversionRequest(BaseModel):
                 "to_currency": "PEN",
                 "amount": "1000000"
             }
-        } 
\ No newline at end of file
+        } 
+
+
+class BatchConversionRequest(BaseModel):
+    # Los elementos se validan uno a uno en el endpoint para reportar errores por elemento
+    conversions: List[Any] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.batch_max_items,
+        description="Conversiones a realizar; cada una se valida como ConversionRequest"
+    )
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "conversions": [
+                    {"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"},
+                    {"from_currency": "COP", "to_currency": "CLP", "amount": "50000"}
+                ]
+            }
+        }
@@ -1,16 +1,18 @@
 from pydantic import BaseModel, Field
 from decimal import Decimal
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 
 class ConversionResponse(BaseModel):
     final_amount: Decimal = Field(..., description="Monto final después de la conversión")
-    intermediate_currency: str = Field(..., description="Criptomoneda usada como intermediaria")
+    intermediate_currency: str = Field(..., description="Criptomoneda usada como intermediaria (monedas intermedias separadas por '-' en rutas de varios saltos)")
     from_currency: str = Field(..., description="Moneda de origen")
     to_currency: str = Field(..., description="Moneda de destino")
     original_amount: Decimal = Field(..., description="Monto original a convertir")
     conversion_rate: Optional[Decimal] = Field(None, description="Tasa de conversión efectiva")
+    route: Optional[List[str]] = Field(None, description="Monedas de la ruta, de origen a destino")
+    data_age_seconds: Optional[float] = Field(None, description="Antigüedad de los precios si se sirvieron desde caché expirado")
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="Timestamp de la conversión")
     
     class Config:
@@ -22,11 +24,55 @@ class ConversionResponse(BaseModel):
                 "to_currency": "PEN",
                 "original_amount": "1000000",
                 "conversion_rate": "0.001234",
+                "route": ["CLP", "BTC", "PEN"],
                 "timestamp": "2024-01-15T10:30:00Z"
             }
         }
 
 
+class BatchConversionItem(BaseModel):
+    index: int = Field(..., description="Posición de la conversión en la solicitud")
+    result: Optional[ConversionResponse] = Field(None, description="Resultado si la conversión fue exitosa")
+    error: Optional[Dict[str, Any]] = Field(None, description="Error si la conversión falló")
+
+
+class BatchConversionResponse(BaseModel):
+    results: List[BatchConversionItem] = Field(..., description="Resultados en el mismo orden de la solicitud")
+    succeeded: int = Field(..., description="Número de conversiones exitosas")
+    failed: int = Field(..., description="Número de conversiones fallidas")
+    
+    class Config:
+        schema_extra = {
+            "example": {
+                "results": [
+                    {
+                        "index": 0,
+                        "result": {
+                            "final_amount": "1234.56",
+                            "intermediate_currency": "BTC",
+                            "from_currency": "CLP",
+                            "to_currency": "PEN",
+                            "original_amount": "1000000",
+                            "conversion_rate": "0.001234",
+                            "timestamp": "2024-01-15T10:30:00Z"
+                        },
+                        "error": None
+                    },
+                    {
+                        "index": 1,
+                        "result": None,
+                        "error": {
+                            "error": "Error de validación en los parámetros de entrada",
+                            "details": {"error": "Las monedas de origen y destino deben ser diferentes"}
+                        }
+                    }
+                ],
+                "succeeded": 1,
+                "failed": 1
+            }
+        }
+
+
 class HealthResponse(BaseModel):
     status: str = Field(..., description="Estado general del servicio")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
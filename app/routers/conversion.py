@@ -1,55 +1,284 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
+from datetime import datetime
 from decimal import Decimal
-from app.models.requests import ConversionRequest
-from app.models.responses import ConversionResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
+import logging
+from app.models.requests import BatchConversionRequest, ConversionRequest
+from app.models.responses import BatchConversionResponse, ConversionResponse
 from app.services.conversion_service import ConversionService
-from app.exceptions.currency_exceptions import CurrencyValidationError
+from app.services.market_registry import Currency
+from app.services.route_graph import RoutePath
+from app.exceptions.currency_exceptions import CurrencyException, CurrencyValidationError
 from app.core.dependencies import get_conversion_service
+from app.core.cache import track_staleness
+from app.core.config import settings
+from app.core.serialization import fast_response, json_dumps, json_loads
+from app.core.timing import span
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Conversion"])
 
+
+def _response_content(
+    request: ConversionRequest,
+    final_amount: Decimal,
+    intermediate_currency: Union[Currency, RoutePath],
+    staleness: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Arma el contenido de un ConversionResponse a partir de datos ya validados.
+    """
+    if isinstance(intermediate_currency, RoutePath):
+        route = list(intermediate_currency)
+    else:
+        route = [request.from_currency, intermediate_currency.value, request.to_currency]
+
+    # Calcular tasa de conversión efectiva
+    conversion_rate = final_amount / request.amount if request.amount > 0 else Decimal('0')
+
+    return {
+        "final_amount": final_amount,
+        "intermediate_currency": intermediate_currency.value,
+        "from_currency": request.from_currency,
+        "to_currency": request.to_currency,
+        "original_amount": request.amount,
+        "conversion_rate": conversion_rate,
+        "route": route,
+        "data_age_seconds": round(staleness["max_age"], 3) if "max_age" in staleness else None,
+        "timestamp": datetime.utcnow()
+    }
+
+
 @router.get("/convert", response_model=ConversionResponse)
+@span("convert_currency")
 async def convert_currency(
     from_currency: str,
     to_currency: str,
-    amount: float,
+    amount: Decimal,
     conversion_service: ConversionService = Depends(get_conversion_service)
 ):
     """
     Convierte un monto de una moneda fiat a otra usando criptomonedas como intermediarias.
-    
+
     - **from_currency**: Moneda de origen (CLP, COP, PEN)
-    - **to_currency**: Moneda de destino (CLP, COP, PEN)  
+    - **to_currency**: Moneda de destino (CLP, COP, PEN)
     - **amount**: Monto a convertir (debe ser mayor que 0)
     """
     try:
         # Validar entrada usando el modelo mejorado
-        request = ConversionRequest(
-            from_currency=from_currency,
-            to_currency=to_currency,
-            amount=Decimal(str(amount))
-        )
+        with span("validate"):
+            request = ConversionRequest(
+                from_currency=from_currency,
+                to_currency=to_currency,
+                amount=amount
+            )
     except ValueError as e:
         raise CurrencyValidationError(
             "Error de validación en los parámetros de entrada",
             {"error": str(e)}
         )
 
-    # Realizar conversión
+    # Realizar conversión registrando si se usaron precios obsoletos
+    staleness = track_staleness()
     final_amount, intermediate_currency = await conversion_service.find_best_conversion(
         request.from_currency,
         request.to_currency,
         request.amount
     )
 
-    # Calcular tasa de conversión efectiva
-    conversion_rate = final_amount / request.amount if request.amount > 0 else Decimal('0')
+    with span("serialize"):
+        return fast_response(
+            ConversionResponse,
+            _response_content(request, final_amount, intermediate_currency, staleness)
+        )
+
+
+@router.post("/convert/batch", response_model=BatchConversionResponse)
+async def convert_batch(
+    batch: BatchConversionRequest,
+    conversion_service: ConversionService = Depends(get_conversion_service)
+):
+    """
+    Convierte muchos montos en una sola solicitud.
+
+    Cada conversión se valida por separado y la mejor ruta se resuelve una
+    sola vez por par de monedas. Los resultados se retornan en el mismo
+    orden, con errores por elemento.
+    """
+    requests: List[Union[ConversionRequest, Dict]] = []
+    for item in batch.conversions:
+        try:
+            if not isinstance(item, dict):
+                raise TypeError("Cada conversión debe ser un objeto con from_currency, to_currency y amount")
+            requests.append(ConversionRequest(**item))
+        except (ValueError, TypeError) as e:
+            requests.append({
+                "error": "Error de validación en los parámetros de entrada",
+                "details": {"error": str(e)}
+            })
+
+    # Con precios del libro de órdenes la ruta depende del monto, así que se
+    # resuelve por conversión en lugar de por par
+    per_amount = conversion_service.quotes_depend_on_amount
 
-    return ConversionResponse(
-        final_amount=final_amount,
-        intermediate_currency=intermediate_currency.value,
-        from_currency=request.from_currency,
-        to_currency=request.to_currency,
-        original_amount=request.amount,
-        conversion_rate=conversion_rate
+    def route_key(request: ConversionRequest) -> Tuple:
+        pair = (request.from_currency, request.to_currency)
+        return (*pair, request.amount) if per_amount else pair
+
+    async def resolve_route(key: Tuple) -> Tuple[Tuple[Decimal, Union[Currency, RoutePath]], Dict[str, float]]:
+        # Cada clave corre en su propia tarea, con su propio registro de antigüedad
+        staleness = track_staleness()
+        if per_amount:
+            from_currency, to_currency, amount = key
+            route = await conversion_service.find_best_conversion(from_currency, to_currency, amount)
+        else:
+            route = await conversion_service.find_best_route(*key)
+        return route, staleness
+
+    # Resolver cada clave distinta una sola vez
+    keys = list(dict.fromkeys(
+        route_key(request)
+        for request in requests
+        if isinstance(request, ConversionRequest)
+    ))
+    route_results = await asyncio.gather(
+        *(resolve_route(key) for key in keys),
+        return_exceptions=True
     )
+    routes: Dict[Tuple, Union[Tuple, BaseException]] = dict(zip(keys, route_results))
+
+    results = []
+    for index, request in enumerate(requests):
+        result: Optional[Dict[str, Any]] = None
+        error = request if isinstance(request, dict) else None
+        if error is None:
+            route = routes[route_key(request)]
+            if isinstance(route, CurrencyException):
+                error = {"error": route.message, "details": jsonable_encoder(route.details)}
+            elif isinstance(route, Exception):
+                logger.error(f"Error inesperado en conversión batch: {str(route)}")
+                error = {"error": "Error interno al resolver la conversión", "details": {}}
+            elif isinstance(route, BaseException):
+                raise route
+            else:
+                (value, intermediate_currency), staleness = route
+                final_amount = value if per_amount else request.amount * value
+                result = _response_content(request, final_amount, intermediate_currency, staleness)
+        results.append({"index": index, "result": result, "error": error})
+
+    failed = sum(1 for item in results if item["error"] is not None)
+    return fast_response(BatchConversionResponse, {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed
+    })
+
+
+class _BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no escucha desconexiones por su cuenta: el generador
+    consume el cuerpo de la solicitud mientras responde y detecta la
+    desconexión del cliente al leerlo.
+    """
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _read_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Lee el cuerpo de la solicitud línea por línea sin cargarlo completo en memoria.
+    Las líneas que superan settings.stream_max_line_bytes se retornan como None.
+    """
+    buffer = b""
+    line_number = 0
+    oversized = False
+    async for chunk in request.stream():
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            line_number += 1
+            yield line_number, None if oversized else line
+            oversized = False
+        if len(buffer) > settings.stream_max_line_bytes:
+            buffer = b""
+            oversized = True
+    if buffer or oversized:
+        yield line_number + 1, None if oversized else buffer
+
+
+@router.post("/convert/stream")
+async def convert_stream(
+    request: Request,
+    conversion_service: ConversionService = Depends(get_conversion_service)
+):
+    """
+    Convierte un flujo de conversiones en formato NDJSON.
+
+    Cada línea del cuerpo es un objeto con from_currency, to_currency y amount;
+    por cada una se emite una línea con el ConversionResponse o un error. El
+    cuerpo se lee a medida que el cliente consume la respuesta, por lo que el
+    uso de memoria es constante.
+    """
+    async def generate() -> AsyncIterator[bytes]:
+        try:
+            async for line in convert_lines():
+                yield line
+        except ClientDisconnect:
+            logger.info("Cliente desconectado durante /convert/stream")
+
+    async def convert_lines() -> AsyncIterator[bytes]:
+        async for line_number, line in _read_lines(request):
+            if line is not None and not line.strip():
+                continue
+
+            error: Optional[Dict] = None
+            try:
+                if line is None:
+                    raise ValueError(f"La línea supera {settings.stream_max_line_bytes} bytes")
+                conversion = ConversionRequest(**json_loads(line))
+            except (ValueError, TypeError) as e:
+                error = {
+                    "error": "Error de validación en los parámetros de entrada",
+                    "details": {"error": str(e)}
+                }
+            else:
+                staleness = track_staleness()
+                try:
+                    # La ruta por par solo sirve si no depende del monto
+                    if conversion_service.quotes_depend_on_amount:
+                        final_amount, intermediate_currency = await conversion_service.find_best_conversion(
+                            conversion.from_currency,
+                            conversion.to_currency,
+                            conversion.amount
+                        )
+                    else:
+                        rate, intermediate_currency = await conversion_service.find_best_route(
+                            conversion.from_currency,
+                            conversion.to_currency
+                        )
+                        final_amount = conversion.amount * rate
+                except CurrencyException as e:
+                    error = {"error": e.message, "details": jsonable_encoder(e.details)}
+                except Exception as e:
+                    # Las líneas anteriores ya se enviaron: reportar el error en su línea y seguir
+                    logger.error(f"Error inesperado en la línea {line_number} de /convert/stream: {str(e)}")
+                    error = {"error": "Error interno al resolver la conversión", "details": {}}
+                else:
+                    content = _response_content(conversion, final_amount, intermediate_currency, staleness)
+                    yield json_dumps(content) + b"\n"
+                    continue
+
+            yield json_dumps({"line": line_number, **error}) + b"\n"
+
+    return _BodyStreamingResponse(generate(), media_type="application/x-ndjson")
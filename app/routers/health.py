@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
+from datetime import datetime
 from app.models.responses import HealthResponse, ReadinessResponse
 from app.services.health_service import HealthService
 from app.core.config import settings
 from app.core.dependencies import get_health_service
+from app.core.serialization import fast_response
 
 router = APIRouter(
     prefix="/health", 
@@ -16,10 +18,11 @@ async def health_check():
     Endpoint básico de health check.
     Retorna el estado general de la aplicación.
     """
-    return HealthResponse(
-        status="healthy",
-        version=settings.app_version
-    )
+    return fast_response(HealthResponse, {
+        "status": "healthy",
+        "timestamp": datetime.utcnow(),
+        "version": settings.app_version
+    })
 
 @router.get("/live", response_model=HealthResponse)
 async def liveness_check(health_service: HealthService = Depends(get_health_service)):
@@ -32,10 +35,11 @@ async def liveness_check(health_service: HealthService = Depends(get_health_serv
     if not is_alive:
         raise HTTPException(status_code=503, detail="Service not alive")
     
-    return HealthResponse(
-        status=status,
-        version=settings.app_version
-    )
+    return fast_response(HealthResponse, {
+        "status": status,
+        "timestamp": datetime.utcnow(),
+        "version": settings.app_version
+    })
 
 @router.get("/ready", response_model=ReadinessResponse)
 async def readiness_check(health_service: HealthService = Depends(get_health_service)):
@@ -57,9 +61,10 @@ async def readiness_check(health_service: HealthService = Depends(get_health_ser
             }
         )
     
-    return ReadinessResponse(
-        status=status,
-        dependencies=dependencies,
-        checks_passed=checks_passed,
-        checks_total=checks_total
-    )
+    return fast_response(ReadinessResponse, {
+        "status": status,
+        "dependencies": dependencies,
+        "timestamp": datetime.utcnow(),
+        "checks_passed": checks_passed,
+        "checks_total": checks_total
+    })
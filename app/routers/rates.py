@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List
+import asyncio
+import logging
+from app.core.config import settings
+from app.core.dependencies import get_rate_broadcaster
+from app.exceptions.currency_exceptions import CurrencyValidationError
+from app.services.market_registry import currency_code, get_market_registry
+from app.services.rate_stream import Pair, RateBroadcaster
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Rates"])
+
+
+def parse_pairs(value: str) -> List[Pair]:
+    """
+    Parsea una lista de pares "CLP-PEN,COP-CLP" validando contra las monedas
+    fiat del registro de mercados.
+    """
+    registry = get_market_registry()
+    pairs = []
+    for item in value.split(","):
+        item = item.strip().upper()
+        if not item:
+            continue
+        codes = item.split("-")
+        if len(codes) != 2 or not all(registry.is_fiat(code) for code in codes):
+            raise CurrencyValidationError(
+                f"Par {item} no soportado. Formato: ORIGEN-DESTINO con monedas {', '.join(sorted(registry.fiats))}",
+                {"pair": item}
+            )
+        pair = (currency_code(codes[0]), currency_code(codes[1]))
+        if pair[0] == pair[1]:
+            raise CurrencyValidationError(
+                "Las monedas de origen y destino deben ser diferentes",
+                {"pair": item}
+            )
+        pairs.append(pair)
+    if not pairs:
+        raise CurrencyValidationError("Se requiere al menos un par", {"pairs": value})
+    if len(pairs) > settings.rate_stream_max_pairs:
+        raise CurrencyValidationError(
+            f"Máximo {settings.rate_stream_max_pairs} pares por suscripción",
+            {"pairs": value}
+        )
+    return pairs
+
+
+@router.get("/rates/stream")
+async def stream_rates(
+    pairs: str = Query(..., description="Pares separados por coma, por ejemplo CLP-PEN,COP-CLP"),
+    broadcaster: RateBroadcaster = Depends(get_rate_broadcaster)
+):
+    """
+    Transmite por Server-Sent Events la mejor tasa de cada par suscrito.
+
+    Se emite un evento `rate` al conectarse y luego solo cuando cambia la tasa
+    o la ruta de un par. Todas las conexiones comparten una única consulta de
+    precios a Buda.
+    """
+    subscribed_pairs = parse_pairs(pairs)
+
+    async def events() -> AsyncIterator[bytes]:
+        # Suscribirse al empezar a transmitir: el generador garantiza la desuscripción
+        subscription = broadcaster.subscribe(subscribed_pairs)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=settings.rate_stream_keepalive)
+                except asyncio.TimeoutError:
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: rate\ndata: " + event + b"\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,11 +1,21 @@
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional
+from decimal import Decimal, InvalidOperation
+import asyncio
 import httpx
 from datetime import datetime
 import logging
+import time
 from app.core.config import settings
-from app.exceptions.currency_exceptions import BudaAPIError, CurrencyNotFoundError
+from app.core.health_state import HealthState
+from app.exceptions.currency_exceptions import BudaAPIError, CurrencyNotFoundError, UpstreamRateLimitError
 from app.core.circuit_breaker import circuit_breaker
-from app.core.cache import cache_response
+from app.core.cache import cache_response, create_cache
+from app.core.single_flight import single_flight
+from app.core.serialization import json_loads
+from app.core.metrics import BUDA_REQUEST_DURATION, BUDA_REQUESTS, BUDA_RETRIES
+from app.core.rate_limiter import RequestPriority, UpstreamRateLimiter, current_priority
+from app.core.retry import LatencyTracker, backoff_delay, is_retryable
+from app.core.timing import span
 
 logger = logging.getLogger(__name__)
 
@@ -19,70 +29,266 @@ class BudaService:
                 max_connections=settings.max_connections
             )
         )
+        self.cache = create_cache()
+        self.health_state = HealthState()
+        self.latency = LatencyTracker(
+            percentile=settings.buda_hedge_percentile,
+            min_samples=settings.buda_hedge_min_samples
+        )
+        self.rate_limiter = UpstreamRateLimiter(
+            settings.buda_rate_limit_rate,
+            settings.buda_rate_limit_burst,
+            settings.buda_rate_limit_max_wait,
+            enabled=settings.buda_rate_limit_enabled
+        )
+        self._price_table_listeners: List[Callable[[Dict], None]] = []
     
-    @circuit_breaker
-    @cache_response(ttl=settings.cache_ttl_ticker)
-    async def get_market_ticker(self, market_id: str) -> Dict:
+    def add_price_table_listener(self, listener: Callable[[Dict], None]) -> None:
         """
-        Obtiene el último precio de un mercado específico.
+        Registra una función que recibe cada tabla de precios nueva obtenida de Buda.
+        """
+        self._price_table_listeners.append(listener)
+    
+    async def _attempt(self, path: str, endpoint: str, deadline: float) -> httpx.Response:
         """
+        Un intento individual de GET a Buda. Espera su turno en el límite de
+        llamadas, registra su latencia para el hedging y ajusta el límite con
+        los headers de la respuesta. El intento dura a lo más
+        settings.buda_attempt_timeout y nunca pasa del deadline (monotónico).
+        """
+        loop = asyncio.get_running_loop()
         try:
-            response = await self.client.get(
-                f"/markets/{market_id}/ticker",
-                timeout=settings.request_timeout
-            )
-            response.raise_for_status()
-            return response.json()
+            # El timeout de httpx es por operación; asyncio.timeout acota el intento completo
+            async with asyncio.timeout(deadline - time.monotonic()) as scope:
+                await self.rate_limiter.acquire()
+                timeout = min(settings.buda_attempt_timeout, deadline - time.monotonic())
+                scope.reschedule(loop.time() + timeout)
+                start = time.perf_counter()
+                response = await self.client.get(path, timeout=max(timeout, 0.0))
+        except TimeoutError:
+            raise httpx.TimeoutException(f"Buda no respondió {path} dentro del presupuesto de tiempo")
+        self.latency.record(endpoint, time.perf_counter() - start)
+        self.rate_limiter.update(response.status_code, response.headers)
+        response.raise_for_status()
+        return response
+    
+    async def _hedged_get(self, path: str, endpoint: str, deadline: float) -> httpx.Response:
+        """
+        Lanza el intento y, si no responde antes del percentil de latencia
+        reciente del endpoint, una petición duplicada. Gana la primera respuesta
+        exitosa y la otra se cancela. Solo las llamadas de usuarios gastan
+        presupuesto en peticiones duplicadas.
+        """
+        delay = None
+        if settings.buda_hedging_enabled and current_priority() == RequestPriority.USER:
+            delay = self.latency.value(endpoint)
+        if delay is None:
+            return await self._attempt(path, endpoint, deadline)
+
+        tasks = {asyncio.ensure_future(self._attempt(path, endpoint, deadline))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(delay, settings.buda_hedge_min_delay))
+            if not done:
+                BUDA_RETRIES.inc(endpoint, "hedge")
+                tasks.add(asyncio.ensure_future(self._attempt(path, endpoint, deadline)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _get_with_retries(self, path: str, endpoint: str) -> httpx.Response:
+        """
+        GET con reintentos ante errores transitorios, con backoff exponencial y
+        jitter, sin exceder settings.request_timeout en total: cada intento
+        recibe solo el tiempo restante y no se reintenta si tras el backoff
+        quedaría menos de settings.buda_retry_min_attempt_time.
+        """
+        deadline = time.monotonic() + settings.request_timeout
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged_get(path, endpoint, deadline)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if attempt >= settings.buda_retry_attempts or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt, settings.buda_retry_backoff_base, settings.buda_retry_backoff_max)
+                if deadline - (time.monotonic() + delay) < settings.buda_retry_min_attempt_time:
+                    raise
+                attempt += 1
+                BUDA_RETRIES.inc(endpoint, "retry")
+                logger.warning(f"Reintentando {path} ({attempt}/{settings.buda_retry_attempts}) en {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+    
+    async def _get_json(self, path: str, error_message: str, market_id: Optional[str] = None) -> Dict:
+        """
+        GET a la API de Buda que retorna el JSON parseado.
+
+        Registra la latencia y el resultado por endpoint y mercado. Con
+        market_id, un 404 se reporta como CurrencyNotFoundError.
+        """
+        details = {"market_id": market_id} if market_id else {}
+        endpoint = path.rsplit("/", 1)[-1]
+        market = market_id or "all"
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            with span("buda_io"):
+                response = await self._get_with_retries(path, endpoint)
+            with span("buda_parse"):
+                payload = json_loads(response.content)
+            outcome = "success"
+            self.health_state.record_success()
+            return payload
         except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
+            if market_id and e.response.status_code == 404:
+                # Buda respondió: el mercado no existe pero la API está disponible
+                outcome = "not_found"
+                self.health_state.record_success()
                 raise CurrencyNotFoundError(
                     f"Mercado {market_id} no encontrado",
-                    {"market_id": market_id}
+                    details
+                )
+            if e.response.status_code == 429:
+                # Buda está disponible pero limitó las llamadas; el límite local ya se pausó
+                outcome = "rate_limited"
+                raise UpstreamRateLimitError(
+                    "Buda API limitó la cantidad de llamadas",
+                    {**details, "status_code": 429}
                 )
             raise BudaAPIError(
-                f"Error al obtener ticker del mercado {market_id}",
-                {"market_id": market_id, "status_code": e.response.status_code}
+                error_message,
+                {**details, "status_code": e.response.status_code}
             )
         except httpx.RequestError as e:
             raise BudaAPIError(
                 f"Error de conexión con Buda API: {str(e)}",
-                {"market_id": market_id}
+                details
             )
         except httpx.TimeoutException as e:
             raise BudaAPIError(
                 f"Timeout al conectar con Buda API: {str(e)}",
-                {"market_id": market_id}
+                details
             )
+        except UpstreamRateLimitError:
+            # Presupuesto local agotado: no se llegó a llamar a Buda
+            outcome = "rate_limited"
+            raise
+        except asyncio.CancelledError:
+            # Llamada abandonada por quien la pidió, no un fallo de Buda
+            outcome = "cancelled"
+            raise
+        finally:
+            if outcome == "error":
+                self.health_state.record_failure(f"{endpoint} ({market})")
+            BUDA_REQUEST_DURATION.observe(time.perf_counter() - start, endpoint, market)
+            BUDA_REQUESTS.inc(endpoint, market, outcome)
+    
+    @span("get_market_ticker")
+    @cache_response(
+        ttl=settings.cache_ttl_ticker,
+        stale_ttl=settings.cache_stale_ttl,
+        stale_if_error=settings.cache_stale_if_error_ttl,
+        negative_ttl=settings.cache_negative_ttl
+    )
+    @single_flight
+    @circuit_breaker
+    async def get_market_ticker(self, market_id: str) -> Dict:
+        """
+        Obtiene el último precio de un mercado específico.
+        """
+        return await self._get_json(
+            f"/markets/{market_id}/ticker",
+            f"Error al obtener ticker del mercado {market_id}",
+            market_id
+        )
     
+    @cache_response(
+        ttl=settings.cache_ttl_order_book,
+        stale_ttl=settings.cache_stale_ttl,
+        stale_if_error=settings.cache_stale_if_error_ttl,
+        negative_ttl=settings.cache_negative_ttl
+    )
+    @single_flight
+    @circuit_breaker
+    async def get_order_book(self, market_id: str) -> Dict:
+        """
+        Obtiene el libro de órdenes (asks y bids) de un mercado específico.
+        """
+        return await self._get_json(
+            f"/markets/{market_id}/order_book",
+            f"Error al obtener libro de órdenes del mercado {market_id}",
+            market_id
+        )
+    
+    @cache_response(
+        ttl=settings.cache_ttl_markets,
+        stale_ttl=settings.cache_stale_ttl,
+        stale_if_error=settings.cache_stale_if_error_ttl
+    )
+    @single_flight
     @circuit_breaker
-    @cache_response(ttl=settings.cache_ttl_markets)
     async def get_available_markets(self) -> Dict:
         """
         Obtiene todos los mercados disponibles.
         """
-        try:
-            response = await self.client.get(
-                "/markets",
-                timeout=settings.request_timeout
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise BudaAPIError(
-                "Error al obtener mercados disponibles",
-                {"status_code": e.response.status_code}
-            )
-        except httpx.RequestError as e:
-            raise BudaAPIError(
-                f"Error de conexión con Buda API: {str(e)}"
-            )
-        except httpx.TimeoutException as e:
-            raise BudaAPIError(
-                f"Timeout al conectar con Buda API: {str(e)}"
-            )
+        return await self._get_json("/markets", "Error al obtener mercados disponibles")
+    
+    @span("get_price_table")
+    @cache_response(
+        ttl=settings.cache_ttl_ticker,
+        stale_ttl=settings.cache_stale_ttl,
+        stale_if_error=settings.cache_stale_if_error_ttl
+    )
+    @single_flight
+    @circuit_breaker
+    async def get_price_table(self) -> Dict:
+        """
+        Obtiene los tickers de todos los mercados en una sola petición y los
+        reduce a una tabla compacta con los precios parseados una sola vez a Decimal:
+        {"fetched_at": timestamp, "prices": {market_id: last_price},
+         "bids": {market_id: max_bid}, "asks": {market_id: min_ask}}.
+        fetched_at identifica el snapshot aunque la tabla venga deserializada
+        desde un caché compartido.
+        """
+        fetched_at = time.time()
+        payload = await self._get_json("/tickers", "Error al obtener tickers de los mercados")
+
+        prices = {}
+        bids = {}
+        asks = {}
+        for ticker in payload.get("tickers", []):
+            try:
+                market_id = ticker["market_id"].lower()
+                prices[market_id] = Decimal(ticker["last_price"][0])
+            except (KeyError, IndexError, TypeError, ValueError, InvalidOperation):
+                logger.debug(f"Ticker inválido en respuesta masiva: {ticker}")
+                continue
+            # Mejor bid y ask, usados por el motor de rutas para cada dirección
+            for field, side in (("max_bid", bids), ("min_ask", asks)):
+                try:
+                    side[market_id] = Decimal(ticker[field][0])
+                except (KeyError, IndexError, TypeError, ValueError, InvalidOperation):
+                    pass
+        price_table = {"fetched_at": fetched_at, "prices": prices, "bids": bids, "asks": asks}
+
+        for listener in self._price_table_listeners:
+            try:
+                listener(price_table)
+            except Exception as e:
+                logger.error(f"Error al notificar nueva tabla de precios: {e}")
+        return price_table
     
     async def close(self):
         """
-        Cierra el cliente HTTP.
+        Cierra el cliente HTTP, el límite de llamadas y el backend de caché.
         """
-        await self.client.aclose() 
\ No newline at end of file
+        await self.rate_limiter.close()
+        await self.client.aclose()
+        await self.cache.close() 
\ No newline at end of file
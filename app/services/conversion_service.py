@@ -1,8 +1,16 @@
-from typing import Dict, Optional, Tuple
+from decimal import Decimal, InvalidOperation
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+import asyncio
 import logging
-from app.models.currency import FiatCurrency, CryptoCurrency
+import time
+from app.core.config import settings
+from app.core.timing import span
 from app.services.buda_service import BudaService
+from app.services.market_registry import Currency, MarketAvailability, currency_code, get_market_registry
+from app.services.order_book import OrderBookDepth
+from app.services.route_graph import CurrencyGraph, RoutePath
 from app.exceptions.currency_exceptions import (
+    BudaAPIError,
     ConversionError,
     CurrencyNotFoundError,
     InvalidAmountError,
@@ -14,12 +22,30 @@ logger = logging.getLogger(__name__)
 class ConversionService:
     def __init__(self, buda_service: BudaService):
         self.buda_service = buda_service
-        self.crypto_currencies = [CryptoCurrency.BTC, CryptoCurrency.ETH, CryptoCurrency.LTC, CryptoCurrency.BCH]
+        # Mejor ruta por par (from, to) para el último snapshot de precios
+        self._rate_matrix: Dict[Tuple[Currency, Currency], Tuple[Decimal, Currency]] = {}
+        self._matrix_prices: Optional[Dict[str, Decimal]] = None
+        self._matrix_registry = None
+        self._matrix_fetched_at = 0.0
+        # Índices de profundidad por mercado, reutilizados mientras el libro cacheado no cambie
+        self._depth_indexes: Dict[str, Tuple[Dict, Tuple[OrderBookDepth, OrderBookDepth]]] = {}
+        # Grafo de monedas por respuesta de /markets y rutas por snapshot de precios
+        self._graph: Optional[Tuple[Dict, CurrencyGraph]] = None
+        # Mercados que respondieron 404, para no volver a consultarlos hasta que venza la marca
+        self.availability = MarketAvailability(settings.cache_negative_ttl)
+        self._graph_routes: Dict[Tuple[Currency, Currency], Tuple[float, CurrencyGraph, Tuple[Decimal, RoutePath]]] = {}
+        self.buda_service.add_price_table_listener(self.update_rate_matrix)
     
-    async def get_conversion_rate(self, market_id: str) -> float:
+    @span("get_conversion_rate")
+    async def get_conversion_rate(self, market_id: str) -> Decimal:
         """
         Obtiene el último precio de un mercado específico.
         """
+        if settings.use_bulk_tickers:
+            price = await self._get_price_from_table(market_id)
+            if price is not None:
+                return price
+
         try:
             ticker = await self.buda_service.get_market_ticker(market_id)
             if not ticker or "ticker" not in ticker:
@@ -27,54 +53,175 @@ class ConversionService:
                     f"No se encontró información de ticker para el mercado {market_id}",
                     {"market_id": market_id}
                 )
-            return float(ticker["ticker"]["last_price"][0])
-        except ValueError as e:
+            return Decimal(ticker["ticker"]["last_price"][0])
+        except (ValueError, InvalidOperation) as e:
             raise ConversionError(
                 f"Error al procesar el precio del mercado {market_id}",
                 {"market_id": market_id, "error": str(e)}
             )
     
-    async def find_best_conversion(
-        self,
-        from_currency: FiatCurrency,
-        to_currency: FiatCurrency,
-        amount: float
-    ) -> Tuple[float, CryptoCurrency]:
+    async def _get_price_from_table(self, market_id: str) -> Optional[Decimal]:
         """
-        Encuentra la mejor ruta de conversión usando una criptomoneda como intermediaria.
+        Busca el precio en la tabla de tickers masiva.
+        Retorna None si la tabla no está disponible para usar el ticker individual.
         """
-        if from_currency == to_currency:
-            raise SameCurrencyError(
-                "No se puede convertir entre la misma moneda",
-                {"from_currency": from_currency, "to_currency": to_currency}
+        try:
+            price_table = await self.buda_service.get_price_table()
+        except BudaAPIError as e:
+            logger.warning(f"Tabla de precios no disponible, usando ticker individual: {e}")
+            return None
+
+        prices = price_table["prices"]
+        if not prices:
+            return None
+        self.update_rate_matrix(price_table)
+        if market_id not in prices:
+            raise CurrencyNotFoundError(
+                f"Mercado {market_id} no encontrado",
+                {"market_id": market_id}
             )
+        return prices[market_id]
 
-        if amount <= 0:
-            raise InvalidAmountError(
-                "El monto a convertir debe ser mayor que cero",
-                {"amount": amount}
+    def update_rate_matrix(self, price_table: Dict) -> None:
+        """
+        Recalcula la matriz de mejores rutas cuando llega un snapshot más nuevo.
+        Como la mejor ruta no depende del monto, cada par queda como (tasa, cripto).
+
+        La vigencia de la matriz se mide desde fetched_at del snapshot, no desde
+        que se leyó: releer la misma tabla (fresca, obsoleta o deserializada
+        desde Redis) no la rejuvenece.
+        """
+        fetched_at = price_table["fetched_at"]
+        if fetched_at <= self._matrix_fetched_at:
+            return
+
+        prices = price_table["prices"]
+        registry = get_market_registry()
+        if prices != self._matrix_prices or registry is not self._matrix_registry:
+            matrix = {}
+            for pair in registry.pairs:
+                for route in registry.routes(*pair):
+                    buy_rate = prices.get(route.buy_market)
+                    sell_rate = prices.get(route.sell_market)
+                    if not buy_rate or not sell_rate:
+                        continue
+                    rate = sell_rate / buy_rate
+                    best = matrix.get(pair)
+                    if best is None or rate > best[0]:
+                        matrix[pair] = (rate, route.crypto)
+            self._rate_matrix = matrix
+            self._matrix_prices = prices
+            self._matrix_registry = registry
+            logger.debug(f"Matriz de tasas recalculada con {len(matrix)} pares")
+        self._matrix_fetched_at = fetched_at
+
+    def _lookup_rate_matrix(
+        self,
+        from_currency: Currency,
+        to_currency: Currency
+    ) -> Optional[Tuple[Decimal, Currency]]:
+        """
+        Retorna la mejor ruta precalculada solo si su snapshot está dentro del TTL.
+        Con datos expirados se usa el camino normal, que pasa por cache_response
+        (stale-while-revalidate / stale-if-error) y registra la antigüedad servida.
+        """
+        if not settings.use_bulk_tickers or not settings.use_rate_matrix:
+            return None
+        if time.time() - self._matrix_fetched_at >= settings.cache_ttl_ticker:
+            return None
+        return self._rate_matrix.get((from_currency, to_currency))
+
+    @property
+    def quotes_depend_on_amount(self) -> bool:
+        """Con precios del libro de órdenes la mejor ruta depende del monto."""
+        return settings.pricing_mode == "order_book"
+
+    async def _fetch_leg_rates(
+        self,
+        markets: Iterable[str],
+        fetch: Optional[Callable[[str], Awaitable[Any]]] = None
+    ) -> Dict[str, Union[Any, Exception]]:
+        """
+        Obtiene los datos de todos los mercados de forma concurrente (por
+        defecto su tasa vía get_conversion_rate).
+        La concurrencia queda acotada por settings.max_connections (1 si el modo
+        concurrente está deshabilitado). Los fallos se retornan como excepciones
+        para que cada ruta los registre por separado. Los mercados marcados
+        como inexistentes no se consultan.
+        """
+        fetch = fetch or self.get_conversion_rate
+        limit = settings.max_connections if settings.concurrent_route_evaluation else 1
+        semaphore = asyncio.Semaphore(max(limit, 1))
+
+        async def fetch_bounded(market_id: str) -> Any:
+            async with semaphore:
+                return await fetch(market_id)
+
+        leg_results: Dict[str, Union[Any, Exception]] = {}
+        pending = []
+        for market_id in markets:
+            if self.availability.is_available(market_id):
+                pending.append(market_id)
+            else:
+                leg_results[market_id] = CurrencyNotFoundError(
+                    f"Mercado {market_id} no encontrado",
+                    {"market_id": market_id}
+                )
+
+        results = await asyncio.gather(*(fetch_bounded(m) for m in pending), return_exceptions=True)
+        for market_id, result in zip(pending, results):
+            if isinstance(result, CurrencyNotFoundError):
+                self.availability.mark_missing(market_id)
+            leg_results[market_id] = result
+        return leg_results
+
+    async def _get_depth(self, market_id: str) -> Tuple[OrderBookDepth, OrderBookDepth]:
+        """
+        Retorna los índices (asks, bids) del libro de órdenes de un mercado.
+        El índice se reconstruye solo cuando cambia el libro cacheado.
+        """
+        order_book = await self.buda_service.get_order_book(market_id)
+        cached = self._depth_indexes.get(market_id)
+        if cached is not None and cached[0] is order_book:
+            return cached[1]
+        try:
+            depth = (
+                OrderBookDepth(order_book["order_book"]["asks"]),
+                OrderBookDepth(order_book["order_book"]["bids"])
             )
+        except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+            raise ConversionError(
+                f"Error al procesar el libro de órdenes del mercado {market_id}",
+                {"market_id": market_id, "error": str(e)}
+            )
+        self._depth_indexes[market_id] = (order_book, depth)
+        return depth
+
+    def _candidate_markets(self, from_currency: Currency, to_currency: Currency) -> Tuple[str, ...]:
+        """Mercados de compra y venta de todas las rutas candidatas, sin repetir."""
+        return get_market_registry().candidate_markets(from_currency, to_currency)
 
-        best_final_amount = None
+    def _select_best(
+        self,
+        from_currency: Currency,
+        to_currency: Currency,
+        evaluate: Callable[[str, str], Decimal]
+    ) -> Tuple[Decimal, Currency]:
+        """
+        Evalúa cada ruta del registro de mercados y retorna el mayor valor.
+        Los errores de cada ruta se acumulan en conversion_errors.
+        """
+        best_value = None
         best_intermediate = None
         conversion_errors = []
 
-        for crypto in self.crypto_currencies:
+        for crypto, buy_market, sell_market in get_market_registry().routes(from_currency, to_currency):
             try:
-                # Intentar comprar crypto con la moneda de origen
-                buy_market = f"{crypto.value.lower()}-{from_currency.value.lower()}"
-                buy_rate = await self.get_conversion_rate(buy_market)
-
-                # Intentar vender crypto por la moneda de destino
-                sell_market = f"{crypto.value.lower()}-{to_currency.value.lower()}"
-                sell_rate = await self.get_conversion_rate(sell_market)
-
-                # Calcular el monto final
-                crypto_amount = amount / buy_rate
-                final_amount = crypto_amount * sell_rate
+                # Comprar crypto con la moneda de origen y venderla por la de destino
+                value = evaluate(buy_market, sell_market)
 
-                if best_final_amount is None or final_amount > best_final_amount:
-                    best_final_amount = final_amount
+                if best_value is None or value > best_value:
+                    best_value = value
                     best_intermediate = crypto
 
             except CurrencyNotFoundError as e:
@@ -85,15 +232,176 @@ class ConversionService:
                 conversion_errors.append(str(e))
                 continue
 
-        if not best_final_amount or not best_intermediate:
+        if not best_value or not best_intermediate:
             raise ConversionError(
                 "No se encontró una ruta de conversión válida",
                 {
                     "from_currency": from_currency,
                     "to_currency": to_currency,
-                    "amount": amount,
                     "errors": conversion_errors
                 }
             )
 
-        return best_final_amount, best_intermediate 
\ No newline at end of file
+        return best_value, best_intermediate
+
+    async def _get_graph(self) -> CurrencyGraph:
+        """
+        Retorna el grafo de monedas, reconstruido solo cuando cambia la lista de mercados.
+        """
+        markets = await self.buda_service.get_available_markets()
+        # La comparación por igualdad cubre mercados deserializados desde un caché compartido
+        if self._graph is None or (self._graph[0] is not markets and self._graph[0] != markets):
+            try:
+                graph = CurrencyGraph.from_payload(markets)
+            except (KeyError, TypeError, AttributeError) as e:
+                raise ConversionError(
+                    "Error al procesar la lista de mercados",
+                    {"error": str(e)}
+                )
+            self._graph = (markets, graph)
+            logger.debug(f"Grafo de monedas reconstruido con {len(graph.edges)} monedas")
+        return self._graph[1]
+
+    async def find_graph_route(
+        self,
+        from_currency: Currency,
+        to_currency: Currency
+    ) -> Tuple[Decimal, RoutePath]:
+        """
+        Encuentra la mejor ruta de hasta settings.route_max_hops mercados sobre
+        todos los mercados de Buda, usando el mejor bid o ask según la dirección
+        de cada pata (o el último precio si no vienen en la tabla).
+        """
+        graph = await self._get_graph()
+        price_table = await self.buda_service.get_price_table()
+
+        cached = self._graph_routes.get((from_currency, to_currency))
+        if cached is not None and cached[0] == price_table["fetched_at"] and cached[1] is graph:
+            return cached[2]
+
+        prices = price_table["prices"]
+        sides = {"bid": price_table.get("bids", {}), "ask": price_table.get("asks", {})}
+
+        def quote(market_id: str, side: str) -> Optional[Decimal]:
+            return sides[side].get(market_id) or prices.get(market_id)
+
+        route = graph.best_path(from_currency.value, to_currency.value, quote, settings.route_max_hops)
+        if route is None:
+            raise ConversionError(
+                "No se encontró una ruta de conversión válida",
+                {
+                    "from_currency": from_currency,
+                    "to_currency": to_currency,
+                    "max_hops": settings.route_max_hops
+                }
+            )
+        self._graph_routes[(from_currency, to_currency)] = (price_table["fetched_at"], graph, route)
+        return route
+
+    @staticmethod
+    def _unwrap_leg(result: Union[Any, BaseException]) -> Any:
+        """Relanza el error de una pata fallida o retorna su resultado."""
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def find_best_route(
+        self,
+        from_currency: Currency,
+        to_currency: Currency
+    ) -> Tuple[Decimal, Union[Currency, RoutePath]]:
+        """
+        Encuentra la mejor tasa (unidades de destino por unidad de origen) y su
+        criptomoneda intermediaria. No depende del monto, por lo que puede
+        reutilizarse para convertir muchos montos del mismo par.
+        Con settings.route_engine == "graph" la intermediaria es la ruta completa.
+        """
+        if from_currency == to_currency:
+            raise SameCurrencyError(
+                "No se puede convertir entre la misma moneda",
+                {"from_currency": from_currency, "to_currency": to_currency}
+            )
+
+        from_currency = currency_code(from_currency)
+        to_currency = currency_code(to_currency)
+
+        if settings.route_engine == "graph":
+            return await self.find_graph_route(from_currency, to_currency)
+
+        # Camino rápido: búsqueda en la matriz precalculada
+        route = self._lookup_rate_matrix(from_currency, to_currency)
+        if route is not None:
+            return route
+
+        # Resolver todas las patas (compra y venta) antes de evaluar las rutas
+        leg_rates = await self._fetch_leg_rates(self._candidate_markets(from_currency, to_currency))
+
+        def evaluate(buy_market: str, sell_market: str) -> Decimal:
+            buy_rate = self._unwrap_leg(leg_rates[buy_market])
+            sell_rate = self._unwrap_leg(leg_rates[sell_market])
+            return sell_rate / buy_rate
+
+        return self._select_best(from_currency, to_currency, evaluate)
+
+    async def find_best_executable(
+        self,
+        from_currency: Currency,
+        to_currency: Currency,
+        amount: Decimal
+    ) -> Tuple[Decimal, Currency]:
+        """
+        Encuentra la ruta con el mayor monto ejecutable recorriendo los libros
+        de órdenes: compra de cripto contra las asks del mercado de origen y
+        venta contra las bids del mercado de destino.
+        """
+        from_currency = currency_code(from_currency)
+        to_currency = currency_code(to_currency)
+        books = await self._fetch_leg_rates(
+            self._candidate_markets(from_currency, to_currency),
+            self._get_depth
+        )
+
+        def evaluate(buy_market: str, sell_market: str) -> Decimal:
+            asks, _ = self._unwrap_leg(books[buy_market])
+            _, bids = self._unwrap_leg(books[sell_market])
+            crypto_amount = asks.base_for_quote(amount, buy_market)
+            return bids.quote_for_base(crypto_amount, sell_market)
+
+        return self._select_best(from_currency, to_currency, evaluate)
+
+    @span("find_best_conversion")
+    async def find_best_conversion(
+        self,
+        from_currency: Currency,
+        to_currency: Currency,
+        amount: Decimal
+    ) -> Tuple[Decimal, Union[Currency, RoutePath]]:
+        """
+        Encuentra la mejor ruta de conversión usando una criptomoneda como intermediaria.
+        Con precios del libro de órdenes se evalúan las rutas fijas fiat-cripto-fiat.
+        Todo el cálculo se hace en Decimal, sin pasar por float.
+        """
+        if from_currency == to_currency:
+            raise SameCurrencyError(
+                "No se puede convertir entre la misma moneda",
+                {"from_currency": from_currency, "to_currency": to_currency}
+            )
+
+        if amount <= 0:
+            raise InvalidAmountError(
+                "El monto a convertir debe ser mayor que cero",
+                {"amount": amount}
+            )
+
+        if not isinstance(amount, Decimal):
+            amount = Decimal(str(amount))
+
+        try:
+            if self.quotes_depend_on_amount:
+                return await self.find_best_executable(from_currency, to_currency, amount)
+            rate, crypto = await self.find_best_route(from_currency, to_currency)
+        except ConversionError as e:
+            e.details["amount"] = amount
+            raise
+
+        return amount * rate, crypto
@@ -1,6 +1,9 @@
 import asyncio
 import logging
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.circuit_breaker import STATE_OPEN, buda_breaker
+from app.core.rate_limiter import RequestPriority, request_priority
 from app.services.buda_service import BudaService
 from app.exceptions.currency_exceptions import BudaAPIError
 
@@ -10,6 +13,8 @@ logger = logging.getLogger(__name__)
 class HealthService:
     def __init__(self, buda_service: BudaService):
         self.buda_service = buda_service
+        self.state = buda_service.health_state
+        self._task: Optional[asyncio.Task] = None
     
     async def check_liveness(self) -> bool:
         """
@@ -21,39 +26,62 @@ class HealthService:
     async def check_readiness(self) -> Tuple[bool, Dict[str, str], int, int]:
         """
         Verifica si la aplicación está lista para recibir tráfico (readiness probe).
+        Solo lee el estado en memoria mantenido por el tráfico normal y por el
+        chequeo en segundo plano; no llama a Buda.
         Retorna: (is_ready, dependencies_status, checks_passed, checks_total)
         """
-        dependencies = {}
-        checks_passed = 0
-        checks_total = 0
-        
-        # Check 1: Buda API connectivity
-        checks_total += 1
-        buda_status = await self._check_buda_api()
-        dependencies["buda_api"] = buda_status
-        if buda_status == "healthy":
-            checks_passed += 1
-        
-        # Check 2: Cache functionality (simple check)
-        checks_total += 1
-        cache_status = await self._check_cache()
-        dependencies["cache"] = cache_status
-        if cache_status == "healthy":
-            checks_passed += 1
+        dependencies = {
+            "buda_api": self._buda_api_status(),
+            "cache": self._cache_status()
+        }
+        checks_total = len(dependencies)
+        checks_passed = sum(1 for status in dependencies.values() if status == "healthy")
         
         # Determinar si está ready
         is_ready = checks_passed == checks_total
         
         return is_ready, dependencies, checks_passed, checks_total
     
+    def _buda_api_status(self) -> str:
+        """
+        Estado de Buda según el circuit breaker y la última respuesta exitosa.
+        Solo los circuitos de los endpoints generales cuentan: un mercado
+        con problemas no deja a la aplicación fuera de servicio.
+        """
+        if any(buda_breaker.state(key) == STATE_OPEN for key in ("get_available_markets", "get_price_table")):
+            return "circuit_open"
+        age = self.state.upstream_age()
+        if age is None:
+            return "unknown"
+        if age > settings.health_max_upstream_age:
+            return "stale"
+        return "healthy"
+    
+    def _cache_status(self) -> str:
+        if self.state.cache_alive is None:
+            return "unknown"
+        return "healthy" if self.state.cache_alive else "unhealthy"
+    
+    async def refresh(self) -> None:
+        """
+        Actualiza el estado de salud: hace ping al caché y consulta Buda solo
+        si el tráfico normal no lo hizo dentro del intervalo de chequeo, con la
+        menor prioridad en el límite de llamadas a Buda.
+        """
+        self.state.record_cache(await self._check_cache() == "healthy")
+        age = self.state.upstream_age()
+        if age is None or age >= settings.health_check_interval:
+            with request_priority(RequestPriority.HEALTH):
+                await self._check_buda_api()
+    
     async def _check_buda_api(self) -> str:
         """
         Verifica la conectividad con la API de Buda.
         """
         try:
-            # Timeout más corto para health checks
+            # Timeout más corto para health checks; sin caché para medir a Buda
             await asyncio.wait_for(
-                self.buda_service.get_available_markets(),
+                self.buda_service.get_available_markets(cache_read=False),
                 timeout=5.0
             )
             return "healthy"
@@ -72,13 +100,48 @@ class HealthService:
         Verifica que el sistema de caché funcione correctamente.
         """
         try:
-            # Test básico de cache - esto es un placeholder
-            # En una implementación real, podrías verificar Redis, Memcached, etc.
-            return "healthy"
+            # Ida y vuelta real contra el backend configurado (memoria o Redis)
+            is_alive = await asyncio.wait_for(self.buda_service.cache.ping(), timeout=5.0)
+            return "healthy" if is_alive else "unhealthy"
+        except asyncio.TimeoutError:
+            logger.warning("Cache health check timeout")
+            return "timeout"
         except Exception as e:
             logger.error(f"Cache health check failed: {e}")
             return "unhealthy"
     
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error en el chequeo de salud en segundo plano: {e}")
+            await asyncio.sleep(settings.health_check_interval)
+    
+    def start(self) -> None:
+        """
+        Inicia el chequeo de salud en segundo plano si no está corriendo.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Chequeo de salud iniciado cada {settings.health_check_interval}s")
+    
+    async def stop(self) -> None:
+        """
+        Detiene el chequeo de salud y espera a que termine.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
     async def get_detailed_status(self) -> Dict:
         """
         Obtiene un estado detallado del sistema para debugging.
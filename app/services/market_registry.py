@@ -0,0 +1,233 @@
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+import time
+from app.core.config import settings
+from app.core.rate_limiter import RequestPriority, request_priority
+from app.models.currency import CryptoCurrency, FiatCurrency
+from app.services.buda_service import BudaService
+
+logger = logging.getLogger(__name__)
+
+
+class Currency(str):
+    """
+    Código de moneda del registro. Expone value como FiatCurrency y
+    CryptoCurrency, así que puede usarse donde antes se usaban los enums.
+    """
+    @property
+    def value(self) -> str:
+        return str(self)
+
+
+def currency_code(currency: Any) -> Currency:
+    """Normaliza un enum o texto a un código de moneda en mayúsculas."""
+    return Currency(str(getattr(currency, "value", currency)).upper())
+
+
+class Route(NamedTuple):
+    """Ruta fiat-cripto-fiat: comprar `crypto` en buy_market y venderla en sell_market."""
+    crypto: Currency
+    buy_market: str
+    sell_market: str
+
+
+class MarketRegistry:
+    """
+    Índice inmutable de los mercados de Buda.
+
+    Las fiat son las monedas que solo aparecen como moneda cotizada; las
+    criptomonedas intermediarias son las bases que cotizan contra alguna
+    fiat. Al construirse precalcula el id de cada mercado (cripto, fiat) y
+    las rutas candidatas de cada par fiat, de modo que validar y enrutar una
+    solicitud son búsquedas en diccionarios, sin armar ids ni intentar
+    mercados que no existen.
+    """
+    def __init__(self, markets: Iterable[Tuple[str, str, str]]):
+        market_ids: Dict[Tuple[str, str], str] = {}
+        bases = set()
+        quotes = set()
+        for base, quote, market_id in markets:
+            base, quote = currency_code(base), currency_code(quote)
+            bases.add(base)
+            quotes.add(quote)
+            market_ids[(base, quote)] = market_id.lower()
+
+        self.fiats: FrozenSet[Currency] = frozenset(quotes - bases)
+        self.market_ids: Dict[Tuple[Currency, Currency], str] = {
+            pair: market_id for pair, market_id in market_ids.items() if pair[1] in self.fiats
+        }
+        self.cryptos: Tuple[Currency, ...] = tuple(sorted({crypto for crypto, _ in self.market_ids}))
+        # Mercados fiat/cripto en orden estable (los que refresca PriceRefresher)
+        self.markets: Tuple[str, ...] = tuple(sorted(self.market_ids.values()))
+
+        self._routes: Dict[Tuple[Currency, Currency], Tuple[Route, ...]] = {}
+        self._candidate_markets: Dict[Tuple[Currency, Currency], Tuple[str, ...]] = {}
+        for from_currency in self.fiats:
+            for to_currency in self.fiats:
+                if from_currency == to_currency:
+                    continue
+                routes = tuple(
+                    Route(crypto, self.market_ids[(crypto, from_currency)], self.market_ids[(crypto, to_currency)])
+                    for crypto in self.cryptos
+                    if (crypto, from_currency) in self.market_ids and (crypto, to_currency) in self.market_ids
+                )
+                pair = (from_currency, to_currency)
+                self._routes[pair] = routes
+                self._candidate_markets[pair] = tuple(dict.fromkeys(
+                    market for route in routes for market in (route.buy_market, route.sell_market)
+                ))
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> "MarketRegistry":
+        """Construye el registro desde la respuesta de /markets de Buda."""
+        return cls(
+            (market["base_currency"], market["quote_currency"], market["id"])
+            for market in payload.get("markets", [])
+        )
+
+    @classmethod
+    def default(cls) -> "MarketRegistry":
+        """Registro con todas las combinaciones de FiatCurrency x CryptoCurrency."""
+        return cls(
+            (crypto.value, fiat.value, f"{crypto.value}-{fiat.value}")
+            for crypto in CryptoCurrency
+            for fiat in FiatCurrency
+        )
+
+    def is_fiat(self, currency: Any) -> bool:
+        return currency_code(currency) in self.fiats
+
+    @property
+    def pairs(self) -> List[Tuple[Currency, Currency]]:
+        """Pares fiat (origen, destino) con al menos una ruta."""
+        return [pair for pair, routes in self._routes.items() if routes]
+
+    def routes(self, from_currency: Any, to_currency: Any) -> Tuple[Route, ...]:
+        return self._routes.get((currency_code(from_currency), currency_code(to_currency)), ())
+
+    def candidate_markets(self, from_currency: Any, to_currency: Any) -> Tuple[str, ...]:
+        """Mercados de compra y venta de las rutas del par, sin repetir."""
+        return self._candidate_markets.get((currency_code(from_currency), currency_code(to_currency)), ())
+
+
+class MarketAvailability:
+    """
+    Mapa de bits de mercados conocidos como inexistentes, con vencimiento.
+
+    Cada mercado recibe un bit la primera vez que se marca. Consultar un
+    mercado cuando no hay ninguno marcado es una comparación contra cero, así
+    que el caso común no tiene costo; los bits vencidos se limpian al
+    consultarlos.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._bits: Dict[str, int] = {}
+        self._missing = 0
+        self._expires: Dict[int, float] = {}
+
+    def mark_missing(self, market_id: str) -> None:
+        bit = self._bits.get(market_id)
+        if bit is None:
+            bit = self._bits[market_id] = 1 << len(self._bits)
+        self._missing |= bit
+        self._expires[bit] = time.time() + self.ttl
+
+    def mark_available(self, market_id: str) -> None:
+        bit = self._bits.get(market_id)
+        if bit is not None and self._missing & bit:
+            self._missing &= ~bit
+            del self._expires[bit]
+
+    def is_available(self, market_id: str) -> bool:
+        if not self._missing:
+            return True
+        bit = self._bits.get(market_id)
+        if bit is None or not self._missing & bit:
+            return True
+        if time.time() >= self._expires[bit]:
+            self.mark_available(market_id)
+            return True
+        return False
+
+
+# Registro vigente: parte de los enums y se reemplaza al cargar los mercados de Buda
+_registry = MarketRegistry.default()
+
+
+def get_market_registry() -> MarketRegistry:
+    """Obtiene el registro de mercados vigente."""
+    return _registry
+
+
+def set_market_registry(registry: MarketRegistry) -> None:
+    """Reemplaza el registro vigente (el cambio es atómico para las solicitudes)."""
+    global _registry
+    _registry = registry
+
+
+class MarketRegistryRefresher:
+    """
+    Recarga periódicamente el registro de mercados desde Buda. Si la carga
+    falla o no encuentra monedas fiat se conserva el registro anterior.
+    """
+    def __init__(self, buda_service: BudaService):
+        self.buda_service = buda_service
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def refresh(self) -> MarketRegistry:
+        """
+        Carga los mercados y publica el nuevo registro si es válido.
+        """
+        payload = await self.buda_service.get_available_markets()
+        try:
+            registry = MarketRegistry.from_payload(payload)
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Lista de mercados inválida, se conserva el registro actual: {e}")
+            return get_market_registry()
+        if not registry.pairs:
+            logger.warning("La lista de mercados no tiene rutas entre monedas fiat, se conserva el registro actual")
+            return get_market_registry()
+        set_market_registry(registry)
+        logger.debug(
+            f"Registro de mercados cargado: {len(registry.fiats)} fiat, "
+            f"{len(registry.cryptos)} criptomonedas, {len(registry.markets)} mercados"
+        )
+        return registry
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                with request_priority(RequestPriority.BACKGROUND):
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error al cargar el registro de mercados: {e}")
+            await asyncio.sleep(settings.market_registry_refresh_interval)
+
+    def start(self) -> None:
+        """
+        Inicia la tarea de recarga si no está corriendo.
+        """
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Registro de mercados se recarga cada {settings.market_registry_refresh_interval}s")
+
+    async def stop(self) -> None:
+        """
+        Detiene la tarea de recarga y espera a que termine.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
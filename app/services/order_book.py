@@ -0,0 +1,51 @@
+from bisect import bisect_left
+from decimal import Decimal
+from itertools import accumulate
+from typing import List, Sequence
+from app.exceptions.currency_exceptions import ConversionError
+
+
+class OrderBookDepth:
+    """
+    Índice de profundidad acumulada de un lado del libro de órdenes.
+
+    Precalcula los montos acumulados en moneda base (cripto) y cotizada (fiat)
+    para que cada cotización sea una búsqueda binaria más una interpolación
+    en el último nivel, en lugar de recorrer todos los niveles.
+    """
+    def __init__(self, levels: Sequence[Sequence[str]]):
+        self.prices: List[Decimal] = []
+        amounts: List[Decimal] = []
+        for price, amount in levels:
+            self.prices.append(Decimal(price))
+            amounts.append(Decimal(amount))
+        self.cumulative_base = list(accumulate(amounts))
+        self.cumulative_quote = list(accumulate(p * a for p, a in zip(self.prices, amounts)))
+
+    def _insufficient(self, market_id: str, requested: Decimal, available: Decimal) -> ConversionError:
+        return ConversionError(
+            f"Liquidez insuficiente en el mercado {market_id}",
+            {"market_id": market_id, "requested": requested, "available": available}
+        )
+
+    def base_for_quote(self, quote_amount: Decimal, market_id: str = "") -> Decimal:
+        """
+        Cripto obtenida al gastar quote_amount recorriendo las asks.
+        """
+        index = bisect_left(self.cumulative_quote, quote_amount)
+        if index >= len(self.prices):
+            raise self._insufficient(market_id, quote_amount, self.cumulative_quote[-1] if self.prices else Decimal(0))
+        spent_before = self.cumulative_quote[index - 1] if index else Decimal(0)
+        base_before = self.cumulative_base[index - 1] if index else Decimal(0)
+        return base_before + (quote_amount - spent_before) / self.prices[index]
+
+    def quote_for_base(self, base_amount: Decimal, market_id: str = "") -> Decimal:
+        """
+        Fiat obtenido al vender base_amount recorriendo las bids.
+        """
+        index = bisect_left(self.cumulative_base, base_amount)
+        if index >= len(self.prices):
+            raise self._insufficient(market_id, base_amount, self.cumulative_base[-1] if self.prices else Decimal(0))
+        sold_before = self.cumulative_base[index - 1] if index else Decimal(0)
+        quote_before = self.cumulative_quote[index - 1] if index else Decimal(0)
+        return quote_before + (base_amount - sold_before) * self.prices[index]
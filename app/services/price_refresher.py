@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import random
+from typing import List, Optional
+from app.core.config import settings
+from app.core.rate_limiter import RequestPriority, request_priority
+from app.services.buda_service import BudaService
+from app.services.market_registry import get_market_registry
+
+logger = logging.getLogger(__name__)
+
+
+class PriceRefresher:
+    """
+    Refresca en segundo plano los precios de todos los pares fiat/cripto
+    antes de que expire su caché, para que /convert no espere a Buda.
+    """
+    def __init__(self, buda_service: BudaService):
+        self.buda_service = buda_service
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def markets(self) -> List[str]:
+        """Mercados fiat/cripto del registro de mercados vigente."""
+        return list(get_market_registry().markets)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def refresh(self) -> None:
+        """
+        Fuerza la actualización de los precios ignorando la lectura de caché.
+        """
+        if settings.use_bulk_tickers:
+            await self.buda_service.get_price_table(cache_read=False)
+            return
+
+        results = await asyncio.gather(
+            *(self.buda_service.get_market_ticker(market, cache_read=False) for market in self.markets),
+            return_exceptions=True
+        )
+        for market, result in zip(self.markets, results):
+            if isinstance(result, Exception):
+                logger.warning(f"No se pudo refrescar el mercado {market}: {result}")
+
+    def _next_delay(self) -> float:
+        """Intervalo hasta el siguiente refresco, con jitter para no sincronizar réplicas."""
+        jitter = random.uniform(-settings.price_refresh_jitter, settings.price_refresh_jitter)
+        return max(settings.price_refresh_interval + jitter, 1.0)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # El refresco cede el presupuesto de llamadas a Buda a las conversiones
+                with request_priority(RequestPriority.BACKGROUND):
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error al refrescar precios en segundo plano: {e}")
+            await asyncio.sleep(self._next_delay())
+
+    def start(self) -> None:
+        """
+        Inicia la tarea de refresco si no está corriendo.
+        """
+        if self.is_running:
+            return
+        if settings.price_refresh_interval >= settings.cache_ttl_ticker:
+            logger.warning(
+                "El intervalo de refresco es mayor o igual al TTL de tickers; "
+                "algunas conversiones esperarán a Buda"
+            )
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Refresco de precios iniciado cada {settings.price_refresh_interval}s")
+
+    async def stop(self) -> None:
+        """
+        Detiene la tarea de refresco y espera a que termine.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Refresco de precios detenido")
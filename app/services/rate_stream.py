@@ -0,0 +1,179 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import asyncio
+import logging
+from app.core.config import settings
+from app.core.rate_limiter import RequestPriority, request_priority
+from app.core.serialization import json_dumps
+from app.services.conversion_service import ConversionService
+from app.services.market_registry import Currency, currency_code
+from app.services.route_graph import RoutePath
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[Currency, Currency]
+
+
+class RateSubscription:
+    """
+    Suscripción de un cliente a un conjunto de pares.
+
+    Los eventos llegan ya serializados a una cola acotada: si el cliente no
+    consume a tiempo se descarta el evento más antiguo, de modo que un
+    consumidor lento solo pierde tasas intermedias y nunca frena al resto.
+    """
+    def __init__(self, pairs: Iterable[Pair], queue_size: int):
+        self.pairs: Tuple[Pair, ...] = tuple(dict.fromkeys(pairs))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def push(self, event: bytes) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> bytes:
+        return await self.queue.get()
+
+
+class RateBroadcaster:
+    """
+    Difunde la mejor tasa de cada par a todos sus suscriptores.
+
+    Una sola tarea calcula las rutas de los pares con suscriptores usando
+    ConversionService.find_best_route, despierta con cada tabla de precios
+    nueva de BudaService (o cada settings.rate_stream_interval si no llega
+    ninguna) y publica solo los pares cuya tasa o ruta cambió. Cada evento se
+    serializa una vez y se reparte a las colas de los suscriptores. La tarea
+    corre solo mientras haya suscriptores.
+    """
+    def __init__(self, conversion_service: ConversionService):
+        self.conversion_service = conversion_service
+        self._subscribers: Dict[Pair, Set[RateSubscription]] = {}
+        # Último evento publicado por par: ((tasa, ruta), evento serializado)
+        self._latest: Dict[Pair, Tuple[Tuple[Decimal, str], bytes]] = {}
+        self._prices_changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.conversion_service.buda_service.add_price_table_listener(self._on_price_table)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({subscription for subscriptions in self._subscribers.values() for subscription in subscriptions})
+
+    def _on_price_table(self, price_table: Dict) -> None:
+        self._prices_changed.set()
+
+    def subscribe(self, pairs: Iterable[Pair]) -> RateSubscription:
+        """
+        Registra una suscripción y le entrega de inmediato la última tasa
+        conocida de cada par.
+        """
+        subscription = RateSubscription(pairs, settings.rate_stream_queue_size)
+        for pair in subscription.pairs:
+            self._subscribers.setdefault(pair, set()).add(subscription)
+            latest = self._latest.get(pair)
+            if latest is not None:
+                subscription.push(latest[1])
+        if not self.is_running:
+            self._task = asyncio.create_task(self._run())
+        else:
+            # Calcular enseguida los pares que aún no tienen tasa publicada
+            self._prices_changed.set()
+        return subscription
+
+    def unsubscribe(self, subscription: RateSubscription) -> None:
+        for pair in subscription.pairs:
+            subscriptions = self._subscribers.get(pair)
+            if subscriptions is None:
+                continue
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[pair]
+                self._latest.pop(pair, None)
+        if subscription.dropped:
+            logger.info(f"Suscriptor lento: {subscription.dropped} eventos de tasas descartados")
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    def _event(pair: Pair, rate: Decimal, intermediate: Union[Currency, RoutePath]) -> bytes:
+        from_currency, to_currency = (currency_code(currency) for currency in pair)
+        if isinstance(intermediate, RoutePath):
+            route = list(intermediate)
+        else:
+            route = [from_currency.value, intermediate.value, to_currency.value]
+        return json_dumps({
+            "from_currency": from_currency.value,
+            "to_currency": to_currency.value,
+            "rate": rate,
+            "intermediate_currency": intermediate.value,
+            "route": route,
+            "timestamp": datetime.utcnow()
+        })
+
+    async def publish_changes(self) -> int:
+        """
+        Recalcula la ruta de cada par con suscriptores y publica los que
+        cambiaron. Retorna la cantidad de pares publicados.
+        """
+        pairs: List[Pair] = list(self._subscribers)
+        results = await asyncio.gather(
+            *(self.conversion_service.find_best_route(*pair) for pair in pairs),
+            return_exceptions=True
+        )
+        published = 0
+        for pair, result in zip(pairs, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning(f"No se pudo calcular la tasa de {currency_code(pair[0])}-{currency_code(pair[1])}: {result}")
+                continue
+            subscriptions = self._subscribers.get(pair)
+            if not subscriptions:
+                continue
+            rate, intermediate = result
+            state = (rate, intermediate.value)
+            latest = self._latest.get(pair)
+            if latest is not None and latest[0] == state:
+                continue
+            event = self._event(pair, rate, intermediate)
+            self._latest[pair] = (state, event)
+            for subscription in subscriptions:
+                subscription.push(event)
+            published += 1
+        return published
+
+    async def _run(self) -> None:
+        while True:
+            self._prices_changed.clear()
+            try:
+                with request_priority(RequestPriority.BACKGROUND):
+                    await self.publish_changes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error al publicar tasas: {e}")
+            try:
+                await asyncio.wait_for(self._prices_changed.wait(), timeout=settings.rate_stream_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """
+        Detiene la tarea de publicación y espera a que termine.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import math
+
+
+class RoutePath(tuple):
+    """
+    Monedas de una ruta, de origen a destino.
+
+    Expone value como las criptomonedas de CryptoCurrency para usarse como
+    moneda intermediaria: las monedas intermedias unidas por "-".
+    """
+    @property
+    def value(self) -> str:
+        return "-".join(self[1:-1])
+
+
+class CurrencyGraph:
+    """
+    Grafo de monedas construido desde la lista de mercados de Buda.
+
+    Cada mercado base-quote aporta dos aristas: vender la base por la
+    cotizada al mejor bid y comprar la base con la cotizada al mejor ask.
+    Se construye una vez por cada respuesta de /markets y se reutiliza entre
+    solicitudes.
+    """
+    def __init__(self, markets: Iterable[Dict]):
+        self.edges: Dict[str, List[Tuple[str, str, str]]] = defaultdict(list)
+        for market in markets:
+            base = market["base_currency"].upper()
+            quote = market["quote_currency"].upper()
+            market_id = market["id"].lower()
+            self.edges[base].append((quote, market_id, "bid"))
+            self.edges[quote].append((base, market_id, "ask"))
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> "CurrencyGraph":
+        return cls(payload.get("markets", []))
+
+    def best_path(
+        self,
+        from_currency: str,
+        to_currency: str,
+        quote: Callable[[str, str], Optional[Decimal]],
+        max_hops: int
+    ) -> Optional[Tuple[Decimal, RoutePath]]:
+        """
+        Busca la ruta de mayor tasa con a lo más max_hops mercados.
+
+        Relaja las aristas por capas (Bellman-Ford acotado en saltos) sobre
+        -log(tasa), de modo que minimizar el costo equivale a maximizar el
+        producto de las tasas. El logaritmo solo ordena las rutas: la tasa
+        retornada es el producto exacto en Decimal de la ruta elegida.
+        quote(market_id, side) retorna el precio del lado "bid" o "ask" del
+        mercado, o None si no está disponible.
+        Retorna (tasa, ruta) o None si no hay ruta.
+        """
+        Label = Tuple[float, Tuple[str, ...], Decimal]
+        frontier: Dict[str, Label] = {from_currency: (0.0, (from_currency,), Decimal(1))}
+        best: Optional[Label] = None
+
+        for _ in range(max_hops):
+            next_frontier: Dict[str, Label] = {}
+            for currency, (cost, path, path_rate) in frontier.items():
+                for neighbor, market_id, side in self.edges.get(currency, ()):
+                    # Solo rutas simples: no volver a pasar por una moneda
+                    if neighbor in path:
+                        continue
+                    price = quote(market_id, side)
+                    if not price or price <= 0:
+                        continue
+                    rate = price if side == "bid" else 1 / price
+                    new_cost = cost - math.log(rate)
+                    candidate = next_frontier.get(neighbor)
+                    if candidate is None or new_cost < candidate[0]:
+                        next_frontier[neighbor] = (new_cost, path + (neighbor,), path_rate * rate)
+
+            # El destino no se sigue expandiendo
+            arrived = next_frontier.pop(to_currency, None)
+            if arrived is not None and (best is None or arrived[0] < best[0]):
+                best = arrived
+            if not next_frontier:
+                break
+            frontier = next_frontier
+
+        if best is None:
+            return None
+        _, path, rate = best
+        return rate, RoutePath(path)
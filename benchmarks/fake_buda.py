@@ -0,0 +1,86 @@
+"""
+Servidor local que imita los endpoints de Buda usados por la API.
+
+La latencia y la tasa de errores se configuran con variables de entorno para
+medir la API sin depender de la red ni de los límites de Buda:
+
+    FAKE_BUDA_LATENCY_MS=20 FAKE_BUDA_JITTER_MS=5 FAKE_BUDA_ERROR_RATE=0.01 \\
+        uvicorn benchmarks.fake_buda:app --port 9000
+"""
+from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+import random
+
+LATENCY_MS = float(os.getenv("FAKE_BUDA_LATENCY_MS", "20"))
+JITTER_MS = float(os.getenv("FAKE_BUDA_JITTER_MS", "5"))
+ERROR_RATE = float(os.getenv("FAKE_BUDA_ERROR_RATE", "0"))
+
+# Último precio por mercado; bid y ask se derivan con un spread fijo
+PRICES = {
+    "BTC-CLP": 50000000.0, "BTC-COP": 200000000.0, "BTC-PEN": 15000.0, "BTC-USDC": 60000.0,
+    "ETH-CLP": 2000000.0, "ETH-COP": 8000000.0, "ETH-PEN": 700.0, "ETH-USDC": 2400.0,
+    "LTC-CLP": 60000.0, "LTC-COP": 240000.0, "LTC-PEN": 21.0,
+    "BCH-CLP": 200000.0, "BCH-COP": 800000.0, "BCH-PEN": 70.0,
+    "USDC-CLP": 830.0, "USDC-COP": 3300.0, "USDC-PEN": 3.8
+}
+SPREAD = 0.002
+
+app = FastAPI(title="Fake Buda API")
+
+
+async def _simulate() -> None:
+    delay = max(LATENCY_MS + random.uniform(-JITTER_MS, JITTER_MS), 0) / 1000
+    await asyncio.sleep(delay)
+    if ERROR_RATE and random.random() < ERROR_RATE:
+        raise HTTPException(status_code=503, detail="Error inyectado")
+
+
+def _ticker(market_id: str) -> dict:
+    price = PRICES[market_id]
+    quote = market_id.split("-")[1]
+    return {
+        "market_id": market_id,
+        "last_price": [str(price), quote],
+        "max_bid": [str(price * (1 - SPREAD)), quote],
+        "min_ask": [str(price * (1 + SPREAD)), quote]
+    }
+
+
+def _market(market_id: str) -> str:
+    market_id = market_id.upper()
+    if market_id not in PRICES:
+        raise HTTPException(status_code=404, detail="Mercado no encontrado")
+    return market_id
+
+
+@app.get("/markets")
+async def markets():
+    await _simulate()
+    return {"markets": [
+        {"id": market_id, "name": market_id.lower(), "base_currency": market_id.split("-")[0],
+         "quote_currency": market_id.split("-")[1]}
+        for market_id in PRICES
+    ]}
+
+
+@app.get("/tickers")
+async def tickers():
+    await _simulate()
+    return {"tickers": [_ticker(market_id) for market_id in PRICES]}
+
+
+@app.get("/markets/{market_id}/ticker")
+async def ticker(market_id: str):
+    await _simulate()
+    return {"ticker": _ticker(_market(market_id))}
+
+
+@app.get("/markets/{market_id}/order_book")
+async def order_book(market_id: str):
+    await _simulate()
+    price = PRICES[_market(market_id)]
+    return {"order_book": {
+        "asks": [[str(price * (1 + SPREAD * level)), "0.5"] for level in range(1, 21)],
+        "bids": [[str(price * (1 - SPREAD * level)), "0.5"] for level in range(1, 21)]
+    }}
@@ -0,0 +1,175 @@
+"""
+Prueba de carga de la API contra el servidor local de Buda simulado.
+
+Levanta benchmarks.fake_buda y la API con uvicorn (salvo que se indique
+--target), ejecuta cada endpoint con una concurrencia fija durante
+--duration segundos por nivel y reporta throughput y latencias p50/p95/p99
+en JSON para comparar corridas:
+
+    python -m benchmarks.load_test --levels 1,10,50 --duration 10 --output before.json
+
+La API se levanta sin control de admisión ni límite de llamadas a Buda
+(LIMITS_DISABLED_ENV), para medir el camino de conversión y no los 429 de
+un solo cliente; --with-limits los mantiene con la configuración vigente.
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+ENDPOINTS = {
+    "convert": ("/convert", {"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"}),
+    "health_ready": ("/health/ready", None)
+}
+
+# Un solo cliente de carga agota enseguida el token bucket por cliente y el
+# presupuesto hacia el servidor simulado
+LIMITS_DISABLED_ENV = {
+    "ADMISSION_ENABLED": "false",
+    "BUDA_RATE_LIMIT_ENABLED": "false"
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil por rango más cercano sobre muestras ordenadas."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, round(q / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, duration: float) -> Dict:
+    """Ejecuta `concurrency` clientes en bucle cerrado durante `duration` segundos."""
+    path, params = ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    errors = 0
+    status_codes: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                if response.status_code >= 400:
+                    errors += 1
+                    status_codes[str(response.status_code)] = status_codes.get(str(response.status_code), 0) + 1
+            except httpx.HTTPError:
+                errors += 1
+                status_codes["transport"] = status_codes.get("transport", 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "errors_by_status": status_codes,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3)
+    }
+
+
+def start_server(app: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env}
+    )
+
+
+async def wait_ready(url: str, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"El servidor {url} no respondió a tiempo")
+
+
+async def main(args: argparse.Namespace) -> Dict:
+    processes: List[subprocess.Popen] = []
+    target: Optional[str] = args.target
+    api_env: Dict[str, str] = {}
+    try:
+        if target is None:
+            fake_url = f"http://127.0.0.1:{args.fake_port}"
+            processes.append(start_server("benchmarks.fake_buda:app", args.fake_port, {
+                "FAKE_BUDA_LATENCY_MS": str(args.latency_ms),
+                "FAKE_BUDA_JITTER_MS": str(args.jitter_ms),
+                "FAKE_BUDA_ERROR_RATE": str(args.error_rate)
+            }))
+            target = f"http://127.0.0.1:{args.port}"
+            api_env = {} if args.with_limits else dict(LIMITS_DISABLED_ENV)
+            processes.append(start_server("main:app", args.port, {"BUDA_API_URL": fake_url, **api_env}))
+            await wait_ready(f"{fake_url}/markets")
+            await wait_ready(f"{target}/health")
+
+        results = []
+        limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=30.0) as client:
+            for endpoint in args.endpoints:
+                # Calentar cachés y conexiones antes de medir
+                await run_level(client, endpoint, 1, 0.5)
+                for concurrency in args.levels:
+                    results.append(await run_level(client, endpoint, concurrency, args.duration))
+
+        return {
+            "target": target,
+            "duration_s": args.duration,
+            "api_env": api_env,
+            "fake_buda": {
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate
+            },
+            "results": results
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=lambda v: [int(x) for x in v.split(",")], default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nivel de concurrencia")
+    parser.add_argument("--endpoints", type=lambda v: v.split(","), default=list(ENDPOINTS))
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument(
+        "--with-limits", action="store_true",
+        help="Mantener el control de admisión y el límite de llamadas a Buda de la configuración"
+    )
+    parser.add_argument("--target", help="URL de una API ya levantada (no se inician servidores)")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,105 @@
+"""
+Micro-benchmarks del camino caliente, sin red:
+
+- cache_response con el valor vigente en caché
+- find_best_conversion resuelta desde la matriz de tasas y desde las patas
+- el decorador de circuit breaker sobre una corrutina trivial
+
+    python -m benchmarks.micro --iterations 20000 --output micro.json
+"""
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict
+from unittest.mock import patch
+import argparse
+import asyncio
+import json
+import time
+from app.core.cache import cache_response
+from app.core.circuit_breaker import circuit_breaker
+from app.models.currency import FiatCurrency
+from app.services.buda_service import BudaService
+from app.services.conversion_service import ConversionService
+
+PRICES = {
+    "btc-clp": Decimal("50000000.0"), "btc-pen": Decimal("15000.0"),
+    "eth-clp": Decimal("2000000.0"), "eth-pen": Decimal("700.0"),
+    "ltc-clp": Decimal("60000.0"), "ltc-pen": Decimal("21.0"),
+    "bch-clp": Decimal("200000.0"), "bch-pen": Decimal("70.0")
+}
+
+
+async def measure(name: str, func: Callable[[], Awaitable], iterations: int) -> Dict:
+    """Ejecuta func secuencialmente y reporta ns por operación."""
+    for _ in range(min(iterations, 1000)):
+        await func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        await func()
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "name": name,
+        "iterations": iterations,
+        "mean_ns": round(total / iterations),
+        "p50_ns": samples[len(samples) // 2],
+        "p99_ns": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "ops_per_s": round(iterations / (total / 1e9), 1)
+    }
+
+
+async def main(iterations: int) -> Dict:
+    results = []
+
+    @cache_response(ttl=3600)
+    async def cached(market_id: str) -> Decimal:
+        return PRICES[market_id]
+
+    results.append(await measure("cache_response_hit", lambda: cached("btc-clp"), iterations))
+
+    @circuit_breaker
+    async def guarded() -> int:
+        return 1
+
+    results.append(await measure("circuit_breaker_success", guarded, iterations))
+
+    buda_service = BudaService()
+    conversion_service = ConversionService(buda_service)
+    try:
+        conversion_service.update_rate_matrix({"fetched_at": time.time(), "prices": PRICES})
+        results.append(await measure(
+            "find_best_conversion_matrix",
+            lambda: conversion_service.find_best_conversion(FiatCurrency.CLP, FiatCurrency.PEN, Decimal("1000000")),
+            iterations
+        ))
+
+        async def leg_rate(market_id: str) -> Decimal:
+            return PRICES[market_id]
+
+        with patch.object(conversion_service, "get_conversion_rate", leg_rate), \
+                patch("app.services.conversion_service.settings.use_rate_matrix", False):
+            results.append(await measure(
+                "find_best_conversion_legs",
+                lambda: conversion_service.find_best_conversion(FiatCurrency.CLP, FiatCurrency.PEN, Decimal("1000000")),
+                iterations
+            ))
+    finally:
+        await buda_service.close()
+
+    return {"results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args.iterations))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -1,9 +1,17 @@
 import logging
 from fastapi import FastAPI
 from app.core.config import settings
-from app.middleware.error_handler import error_handler_middleware
-from app.routers import health, conversion
-from app.core.dependencies import cleanup_services
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.error_handler import ErrorHandlerMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.timing import ServerTimingMiddleware
+from app.routers import health, conversion, metrics, rates
+from app.core.dependencies import (
+    cleanup_services,
+    get_health_service,
+    get_market_registry_refresher,
+    get_price_refresher
+)
 
 # Configuración de logging usando settings
 logging.basicConfig(
@@ -22,11 +30,19 @@ app = FastAPI(
 )
 
 # Agregar middleware de manejo de errores
-app.middleware("http")(error_handler_middleware)
+app.add_middleware(ErrorHandlerMiddleware)
+# Control de admisión: descarta rápido con 429/503 antes de ocupar recursos
+app.add_middleware(AdmissionControlMiddleware)
+# Server-Timing y profiling por muestreo (opcionales, configurables en caliente)
+app.add_middleware(ServerTimingMiddleware)
+# Métricas por fuera del manejo de errores para registrar el estado final
+app.add_middleware(MetricsMiddleware)
 
 # Incluir routers
 app.include_router(health.router)
 app.include_router(conversion.router)
+app.include_router(rates.router)
+app.include_router(metrics.router)
 
 @app.on_event("startup")
 async def startup_event():
@@ -36,6 +52,11 @@ async def startup_event():
     logger.info(f"Iniciando {settings.app_name} v{settings.app_version}")
     logger.info(f"Configuración: Buda API URL = {settings.buda_api_url}")
     logger.info(f"Configuración: Request timeout = {settings.request_timeout}s")
+    get_health_service().start()
+    if settings.market_registry_enabled:
+        get_market_registry_refresher().start()
+    if settings.price_refresh_enabled:
+        get_price_refresher().start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -1,8 +1,10 @@
 import pytest
 import asyncio
 from typing import AsyncGenerator
+from app.core.circuit_breaker import buda_breaker
 from app.services.buda_service import BudaService
 from app.services.conversion_service import ConversionService
+from app.services.market_registry import MarketRegistry, set_market_registry
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -11,6 +13,19 @@ def event_loop():
     yield loop
     loop.close()
 
+@pytest.fixture(autouse=True)
+def reset_circuit_breaker():
+    """Cada test parte con todos los circuitos cerrados."""
+    buda_breaker.reset()
+    yield
+    buda_breaker.reset()
+
+@pytest.fixture(autouse=True)
+def reset_market_registry():
+    """Cada test parte con el registro de mercados por defecto (los enums)."""
+    yield
+    set_market_registry(MarketRegistry.default())
+
 @pytest.fixture
 async def buda_service() -> AsyncGenerator[BudaService, None]:
     """Fixture para el servicio de Buda."""
@@ -0,0 +1,309 @@
+import pytest
+import asyncio
+import json
+import time
+import httpx
+from decimal import Decimal
+from unittest.mock import patch, AsyncMock, MagicMock
+from main import app
+from app.core.dependencies import get_conversion_service
+from app.middleware.admission import AdmissionControlMiddleware
+from app.services.buda_service import BudaService
+from app.services.conversion_service import ConversionService
+
+TICKERS = {
+    "tickers": [
+        {"market_id": "BTC-CLP", "last_price": ["50000000.0", "CLP"]},
+        {"market_id": "BTC-PEN", "last_price": ["15000.0", "PEN"]},
+        {"market_id": "ETH-CLP", "last_price": ["2000000.0", "CLP"]},
+        {"market_id": "ETH-PEN", "last_price": ["700.0", "PEN"]}
+    ]
+}
+
+
+@pytest.fixture
+async def client():
+    """Cliente HTTP contra la aplicación con Buda simulado vía /tickers."""
+    buda_service = BudaService()
+    conversion_service = ConversionService(buda_service)
+    app.dependency_overrides[get_conversion_service] = lambda: conversion_service
+
+    mock_response = MagicMock()
+    mock_response.content = json.dumps(TICKERS).encode()
+    mock_response.raise_for_status = MagicMock()
+
+    with patch.object(buda_service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
+            test_client.buda_get = mock_get
+            yield test_client
+
+    app.dependency_overrides.clear()
+    await buda_service.close()
+
+
+@pytest.mark.asyncio
+async def test_convert_endpoint(client):
+    """Test para el endpoint GET /convert."""
+    response = await client.get(
+        "/convert",
+        params={"from_currency": "CLP", "to_currency": "PEN", "amount": 1000000}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["intermediate_currency"] == "ETH"
+    assert float(body["final_amount"]) == pytest.approx(350.0)
+    assert body["data_age_seconds"] is None
+
+
+@pytest.mark.asyncio
+async def test_convert_endpoint_is_decimal_exact(client):
+    """Test para verificar que montos grandes se convierten sin deriva de float."""
+    response = await client.get(
+        "/convert",
+        params={"from_currency": "CLP", "to_currency": "PEN", "amount": "999999999.12345678"}
+    )
+
+    assert response.status_code == 200
+    assert Decimal(response.json()["final_amount"]) == Decimal("999999999.12345678") * Decimal("0.00035")
+
+
+@pytest.mark.asyncio
+async def test_fast_json_response_matches_response_model(client):
+    """Test para verificar que el modo rápido serializa igual que response_model."""
+    params = {"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000.5"}
+    fast = (await client.get("/convert", params=params)).json()
+    with patch('app.core.serialization.settings.fast_json_responses', False):
+        validated = (await client.get("/convert", params=params)).json()
+
+    fast.pop("timestamp")
+    validated.pop("timestamp")
+    assert fast == validated
+    assert (await client.get("/health")).json()["status"] == "healthy"
+
+
+@pytest.mark.asyncio
+async def test_convert_endpoint_marks_stale_prices_when_buda_fails(client):
+    """Test para verificar que los precios obsoletos se marcan aunque exista la matriz."""
+    params = {"from_currency": "CLP", "to_currency": "PEN", "amount": 1000000}
+    assert (await client.get("/convert", params=params)).json()["data_age_seconds"] is None
+
+    client.buda_get.side_effect = httpx.ConnectError("Connection failed")
+    start = time.time()
+    for delay in (100, 160):
+        with patch('time.time', return_value=start + delay):
+            response = await client.get("/convert", params=params)
+
+        assert response.status_code == 200
+        assert response.json()["data_age_seconds"] == pytest.approx(delay, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_convert_endpoint_invalid_currency(client):
+    """Test para parámetros inválidos en GET /convert."""
+    response = await client.get(
+        "/convert",
+        params={"from_currency": "USD", "to_currency": "PEN", "amount": 1000}
+    )
+
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_rates_stream_invalid_pair(client):
+    """Test para pares inválidos en GET /rates/stream."""
+    for pairs in ("CLP-USD", "CLP-CLP", "CLPPEN"):
+        response = await client.get("/rates/stream", params={"pairs": pairs})
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_convert_batch_endpoint(client):
+    """Test para el endpoint POST /convert/batch con errores por elemento."""
+    response = await client.post("/convert/batch", json={
+        "conversions": [
+            {"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"},
+            {"from_currency": "CLP", "to_currency": "CLP", "amount": "1000"},
+            {"from_currency": "PEN", "to_currency": "CLP", "amount": "350"},
+            {"from_currency": "CLP", "to_currency": "PEN", "amount": "2000000"}
+        ]
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 3
+    assert body["failed"] == 1
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3]
+    assert float(body["results"][0]["result"]["final_amount"]) == pytest.approx(350.0)
+    assert body["results"][1]["error"] is not None
+    assert body["results"][2]["result"]["intermediate_currency"] == "BTC"
+    assert float(body["results"][3]["result"]["final_amount"]) == pytest.approx(700.0)
+
+
+@pytest.mark.asyncio
+async def test_convert_batch_non_object_items_are_per_item(client):
+    """Test para reportar por elemento las conversiones que no son objetos."""
+    response = await client.post("/convert/batch", json={
+        "conversions": [
+            "x",
+            {"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"},
+            [1]
+        ]
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 1
+    assert body["failed"] == 2
+    assert "debe ser un objeto" in body["results"][0]["error"]["details"]["error"]
+    assert float(body["results"][1]["result"]["final_amount"]) == pytest.approx(350.0)
+    assert body["results"][2]["error"] is not None
+
+
+@pytest.mark.asyncio
+async def test_convert_stream_endpoint(client):
+    """Test para el endpoint NDJSON POST /convert/stream."""
+    body = (
+        b'{"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"}\n'
+        b'not json\n'
+        b'\n'
+        b'{"from_currency": "PEN", "to_currency": "CLP", "amount": "350"}'
+    )
+
+    response = await client.post("/convert/stream", content=body)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert float(lines[0]["final_amount"]) == pytest.approx(350.0)
+    assert lines[1]["line"] == 2
+    assert "error" in lines[1]
+    assert lines[2]["intermediate_currency"] == "BTC"
+
+
+@pytest.mark.asyncio
+async def test_convert_batch_unexpected_error_is_per_item(client):
+    """Test para verificar que un error inesperado en un par no hace fallar el batch."""
+    original = ConversionService.find_best_route
+
+    async def flaky_route(self, from_currency, to_currency):
+        if from_currency == "PEN":
+            raise RuntimeError("boom")
+        return await original(self, from_currency, to_currency)
+
+    with patch.object(ConversionService, 'find_best_route', flaky_route):
+        response = await client.post("/convert/batch", json={
+            "conversions": [
+                {"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"},
+                {"from_currency": "PEN", "to_currency": "CLP", "amount": "350"}
+            ]
+        })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 1
+    assert body["results"][0]["result"]["data_age_seconds"] is None
+    assert body["results"][1]["error"]["error"] == "Error interno al resolver la conversión"
+
+
+@pytest.mark.asyncio
+async def test_convert_stream_unexpected_error_is_per_line(client):
+    """Test para verificar que un error inesperado en una línea no corta el flujo NDJSON."""
+    original = ConversionService.find_best_route
+
+    async def flaky_route(self, from_currency, to_currency):
+        if from_currency == "PEN":
+            raise RuntimeError("boom")
+        return await original(self, from_currency, to_currency)
+
+    body = (
+        b'{"from_currency": "CLP", "to_currency": "PEN", "amount": "1000000"}\n'
+        b'{"from_currency": "PEN", "to_currency": "CLP", "amount": "350"}\n'
+        b'{"from_currency": "CLP", "to_currency": "PEN", "amount": "2000000"}\n'
+    )
+    with patch.object(ConversionService, 'find_best_route', flaky_route):
+        response = await client.post("/convert/stream", content=body)
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert float(lines[0]["final_amount"]) == pytest.approx(350.0)
+    assert lines[1] == {"line": 2, "error": "Error interno al resolver la conversión", "details": {}}
+    assert float(lines[2]["final_amount"]) == pytest.approx(700.0)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client):
+    """Test para el endpoint GET /metrics en formato Prometheus."""
+    await client.get("/convert", params={"from_currency": "CLP", "to_currency": "PEN", "amount": 1000})
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/convert",status="200"}' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/convert",le="+Inf"}' in text
+    assert 'buda_requests_total{endpoint="tickers",market="all",outcome="success"}' in text
+    assert 'cache_requests_total{function="get_price_table",result="miss"}' in text
+    assert "http_requests_in_flight 1" in text
+
+
+@pytest.mark.asyncio
+async def test_server_timing_and_sampled_profiling(client, tmp_path):
+    """Test para el header Server-Timing y el profiling por muestreo configurables en caliente."""
+    params = {"from_currency": "CLP", "to_currency": "PEN", "amount": 1000}
+    assert "server-timing" not in (await client.get("/convert", params=params)).headers
+
+    with patch('app.middleware.timing.settings.server_timing_enabled', True), \
+            patch('app.middleware.timing.settings.profiling_sample_rate', 1.0), \
+            patch('app.middleware.timing.settings.profiling_dump_dir', str(tmp_path)), \
+            patch('app.services.conversion_service.settings.use_rate_matrix', False):
+        response = await client.get("/convert", params=params)
+
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    for name in ("convert_currency", "validate", "find_best_conversion", "get_conversion_rate", "serialize", "total"):
+        assert f"{name};dur=" in timing
+    assert len(list(tmp_path.glob("*-convert.prof"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_admission_control_rate_limit_and_shedding():
+    """Test para 429 sin tokens, 503 al superar la espera en cola y health exento."""
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        if scope["path"] == "/slow":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionControlMiddleware(slow_app)
+    transport = httpx.ASGITransport(app=middleware)
+    with patch.multiple(
+        'app.middleware.admission.settings',
+        admission_rate=1.0, admission_burst=3.0, admission_max_in_flight=1, admission_max_queue_time=0.05
+    ):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as test_client:
+            slow = asyncio.create_task(test_client.get("/slow"))
+            await asyncio.sleep(0.01)
+
+            # El único cupo está ocupado: la siguiente espera en cola y se descarta
+            response = await test_client.get("/convert")
+            assert response.status_code == 503
+            assert response.headers["retry-after"] == "1"
+
+            release.set()
+            assert (await slow).status_code == 200
+            assert (await test_client.get("/convert")).status_code == 200
+
+            # Sin tokens: 429 con Retry-After; los health checks siguen respondiendo
+            response = await test_client.get("/convert")
+            assert response.status_code == 429
+            assert int(response.headers["retry-after"]) >= 1
+            assert (await test_client.get("/health/ready")).status_code == 200
@@ -0,0 +1,240 @@
+import pytest
+import asyncio
+from decimal import Decimal
+from unittest.mock import patch
+from app.core.cache import LRUCache, cache_response, track_staleness
+from app.core.redis_cache import RedisCache
+from app.exceptions.currency_exceptions import BudaAPIError, CurrencyNotFoundError
+
+
+class FakeClock:
+    """Reloj controlable para simular el paso del tiempo en el caché."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    """Test para servir el valor expirado mientras se refresca en segundo plano."""
+    calls = []
+
+    @cache_response(ttl=10, stale_ttl=5)
+    async def fetch(market_id):
+        calls.append(market_id)
+        return len(calls)
+
+    clock = FakeClock()
+    with patch('app.core.cache.time.time', clock):
+        assert await fetch("btc-clp") == 1
+
+        clock.now += 12
+        staleness = track_staleness()
+        assert await fetch("btc-clp") == 1
+        assert staleness["max_age"] == pytest.approx(12)
+
+        # Dejar correr la revalidación en segundo plano
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert await fetch("btc-clp") == 2
+        assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_if_error():
+    """Test para servir el último valor bueno cuando Buda falla."""
+    fail = False
+
+    @cache_response(ttl=10, stale_if_error=60)
+    async def fetch(market_id):
+        if fail:
+            raise BudaAPIError("Buda no disponible")
+        return "ok"
+
+    clock = FakeClock()
+    with patch('app.core.cache.time.time', clock):
+        assert await fetch("btc-clp") == "ok"
+
+        fail = True
+        clock.now += 30
+        staleness = track_staleness()
+        assert await fetch("btc-clp") == "ok"
+        assert staleness["max_age"] == pytest.approx(30)
+
+        clock.now += 60
+        with pytest.raises(BudaAPIError):
+            await fetch("btc-clp")
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_for_missing_markets():
+    """Test para recordar un mercado inexistente sin volver a consultarlo hasta que venza."""
+    calls = []
+
+    @cache_response(ttl=60, negative_ttl=30)
+    async def fetch(market_id):
+        calls.append(market_id)
+        raise CurrencyNotFoundError(f"Mercado {market_id} no encontrado", {"market_id": market_id})
+
+    clock = FakeClock()
+    with patch('app.core.cache.time.time', clock):
+        for _ in range(3):
+            with pytest.raises(CurrencyNotFoundError) as exc_info:
+                await fetch("xrp-clp")
+            assert exc_info.value.details == {"market_id": "xrp-clp"}
+        assert calls == ["xrp-clp"]
+
+        clock.now += 31
+        with pytest.raises(CurrencyNotFoundError):
+            await fetch("xrp-clp")
+        assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_cache_eviction_and_counters():
+    """Test para la expulsión LRU y los contadores del caché en memoria."""
+    cache = LRUCache(max_entries=2)
+    now = 1000.0
+
+    with patch('app.core.cache.time.time', return_value=now):
+        await cache.set(("get_market_ticker", "btc-clp"), {"price": 1}, now, 60)
+        await cache.set(("get_market_ticker", "eth-clp"), {"price": 2}, now, 60)
+        assert await cache.get(("get_market_ticker", "btc-clp")) == ({"price": 1}, now)
+
+        # eth-clp es la entrada menos usada y debe ser expulsada
+        await cache.set(("get_market_ticker", "ltc-clp"), {"price": 3}, now, 60)
+        assert await cache.get(("get_market_ticker", "eth-clp")) is None
+
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 1, "evictions": 1}
+
+
+@pytest.mark.asyncio
+async def test_cache_uses_owner_cache_with_structured_keys():
+    """Test para verificar que los métodos usan el caché de la instancia."""
+    class Owner:
+        def __init__(self):
+            self.cache = LRUCache()
+
+        @cache_response(ttl=10)
+        async def get_market_ticker(self, market_id):
+            return {"market_id": market_id}
+
+    owner = Owner()
+    await owner.get_market_ticker("btc-clp")
+    await owner.get_market_ticker("btc-clp")
+
+    assert await owner.cache.get(("get_market_ticker", "btc-clp")) is not None
+    assert owner.cache.hits == 2
+
+
+class FakeRedisServer:
+    """Servidor RESP mínimo en memoria que reemplaza a Redis en los tests."""
+    def __init__(self):
+        self.data = {}
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            parts = []
+            for _ in range(int(line[1:-2])):
+                length = int((await reader.readline())[1:-2])
+                parts.append((await reader.readexactly(length + 2))[:-2])
+            command = parts[0].upper()
+            if command == b"PING":
+                writer.write(b"+PONG\r\n")
+            elif command == b"SET":
+                self.data[parts[1]] = parts[2]
+                writer.write(b"+OK\r\n")
+            elif command == b"GET":
+                value = self.data.get(parts[1])
+                writer.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif command == b"SCAN":
+                pattern = parts[3].rstrip(b"*")
+                keys = [key for key in self.data if key.startswith(pattern)]
+                writer.write(b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys))
+                for key in keys:
+                    writer.write(b"$%d\r\n%s\r\n" % (len(key), key))
+            elif command == b"AUTH":
+                writer.write(b"-WRONGPASS invalid password\r\n")
+            elif command == b"DEL":
+                removed = sum(1 for key in parts[1:] if self.data.pop(key, None) is not None)
+                writer.write(b":%d\r\n" % removed)
+            else:
+                writer.write(b"-ERR unknown command\r\n")
+            await writer.drain()
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_shared_between_workers():
+    """Test para verificar que dos workers comparten entradas vía el backend Redis."""
+    server = FakeRedisServer()
+    await server.start()
+    url = f"redis://127.0.0.1:{server.port}/0"
+    worker_a = RedisCache(url)
+    worker_b = RedisCache(url)
+
+    try:
+        assert await worker_a.ping()
+
+        await worker_a.set(("get_price_table",), {"btc-clp": Decimal("50000000.12345678")}, 1000.0, 60)
+        assert server.data[b"buda:get_price_table"] == b'[1000.0,{"btc-clp":{"$decimal":"50000000.12345678"}}]'
+        # Los precios vuelven como Decimal exactos
+        assert await worker_b.get(("get_price_table",)) == ({"btc-clp": Decimal("50000000.12345678")}, 1000.0)
+
+        await worker_b.delete(("get_price_table",))
+        assert await worker_a.get(("get_price_table",)) is None
+        assert worker_b.stats()["hits"] == 1
+    finally:
+        await worker_a.close()
+        await worker_b.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_unavailable_is_a_miss():
+    """Test para verificar que un servidor caído se trata como fallo de caché."""
+    cache = RedisCache("redis://127.0.0.1:1/0", timeout=0.5)
+
+    assert await cache.get(("get_price_table",)) is None
+    assert cache.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_corrupt_entry_and_clear():
+    """Test para entradas corruptas, limpieza con SCAN y fallos de AUTH."""
+    server = FakeRedisServer()
+    await server.start()
+    cache = RedisCache(f"redis://127.0.0.1:{server.port}/0")
+    bad_auth = RedisCache(f"redis://:secret@127.0.0.1:{server.port}/0")
+
+    try:
+        server.data[b"buda:get_price_table"] = b"{not json"
+        assert await cache.get(("get_price_table",)) is None
+        assert cache.stats()["errors"] == 1
+
+        await cache.set(("get_market_ticker", "btc-clp"), {"price": 1}, 1000.0, 60)
+        server.data[b"other:key"] = b"1"
+        await cache.clear()
+        assert list(server.data) == [b"other:key"]
+
+        assert await bad_auth.get(("get_price_table",)) is None
+        assert bad_auth._pool.empty()
+    finally:
+        await cache.close()
+        await bad_auth.close()
+        await server.stop()
@@ -1,39 +1,50 @@
 import pytest
 import asyncio
+import json
+import time
+from decimal import Decimal
 from unittest.mock import patch, AsyncMock, MagicMock
 import httpx
-import pybreaker
 from app.models.currency import FiatCurrency, CryptoCurrency
 from app.services.buda_service import BudaService
 from app.services.conversion_service import ConversionService
+from app.services.price_refresher import PriceRefresher
+from app.services.health_service import HealthService
+from app.services.rate_stream import RateBroadcaster
+from app.services.market_registry import MarketRegistryRefresher, get_market_registry
+from app.models.requests import ConversionRequest
 from app.exceptions.currency_exceptions import (
     CurrencyNotFoundError,
     ConversionError,
     InvalidAmountError,
     SameCurrencyError,
-    BudaAPIError
+    BudaAPIError,
+    CircuitOpenError,
+    UpstreamRateLimitError
 )
-from app.core.circuit_breaker import buda_breaker
+from app.core.config import settings
+from app.core.circuit_breaker import AsyncCircuitBreaker, STATE_CLOSED, STATE_OPEN, buda_breaker
+from app.core.rate_limiter import RequestPriority, UpstreamRateLimiter
 
 @pytest.mark.asyncio
 async def test_get_conversion_rate(conversion_service):
     """Test para obtener la tasa de conversión."""
     # Mock de respuesta exitosa de Buda API
     mock_response = MagicMock()
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "ticker": {
             "last_price": ["50000000.0"]
         }
-    }
+    }).encode()
     mock_response.raise_for_status = MagicMock()
     
     with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get:
         mock_get.return_value = mock_response
         
         rate = await conversion_service.get_conversion_rate("btc-clp")
-        assert isinstance(rate, float)
+        assert isinstance(rate, Decimal)
         assert rate > 0
-        assert rate == 50000000.0
+        assert rate == Decimal("50000000.0")
 
 @pytest.mark.asyncio
 async def test_get_conversion_rate_not_found(conversion_service):
@@ -55,11 +66,11 @@ async def test_cache_behavior():
     service = BudaService()
     
     mock_response = MagicMock()
-    mock_response.json.return_value = {
+    mock_response.content = json.dumps({
         "ticker": {
             "last_price": ["50000000.0"]
         }
-    }
+    }).encode()
     mock_response.raise_for_status = MagicMock()
     
     with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get:
@@ -81,26 +92,71 @@ async def test_cache_behavior():
 
 @pytest.mark.asyncio
 async def test_circuit_breaker():
-    """Test para verificar el circuit breaker."""
-    # Crear un nuevo circuit breaker para el test
+    """Test para verificar que el circuit breaker se abre por mercado."""
     test_service = BudaService()
-    
-    with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get:
-        # Configurar el mock para que siempre falle con una excepción de conexión
-        mock_get.side_effect = httpx.ConnectError("Connection failed")
-        
-        # Intentar varias llamadas para activar el circuit breaker
-        for i in range(6):  # Aumenté a 6 para asegurar que se active
-            try:
-                await test_service.get_market_ticker("btc-clp")
-            except (BudaAPIError, httpx.ConnectError):
-                pass  # Esperamos que falle
-        
-        # El test pasa si no hay errores en la ejecución
-        # (No verificamos el estado del circuit breaker porque es complejo de verificar)
-        
+    ok_response = MagicMock()
+    ok_response.content = json.dumps({"ticker": {"last_price": ["4000000.0"]}}).encode()
+    ok_response.raise_for_status = MagicMock()
+
+    async def fake_get(path, **kwargs):
+        if "btc-clp" in path:
+            raise httpx.ConnectError("Connection failed")
+        return ok_response
+
+    with patch.object(test_service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = fake_get
+
+        for _ in range(buda_breaker.failure_threshold):
+            with pytest.raises(BudaAPIError):
+                await test_service.get_market_ticker("btc-clp", cache_read=False)
+        assert buda_breaker.state("btc-clp") == STATE_OPEN
+
+        # Con el circuito abierto se falla de inmediato sin llamar a Buda
+        calls = mock_get.await_count
+        with pytest.raises(CircuitOpenError):
+            await test_service.get_market_ticker("btc-clp", cache_read=False)
+        assert mock_get.await_count == calls
+
+        # Los demás mercados siguen funcionando
+        ticker = await test_service.get_market_ticker("btc-pen", cache_read=False)
+        assert ticker["ticker"]["last_price"][0] == "4000000.0"
+        assert buda_breaker.state("btc-pen") == STATE_CLOSED
+
     await test_service.close()
 
+@pytest.mark.asyncio
+async def test_circuit_breaker_half_open_limits_probes():
+    """Test para verificar que en semiabierto solo pasan las llamadas de prueba permitidas."""
+    breaker = AsyncCircuitBreaker("test", failure_threshold=2, recovery_timeout=30, half_open_max_calls=1)
+    release = asyncio.Event()
+    calls = 0
+
+    async def failing():
+        raise BudaAPIError("Buda caído")
+
+    async def probe():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "ok"
+
+    with patch('app.core.circuit_breaker.time.monotonic', return_value=1000.0) as monotonic:
+        for _ in range(2):
+            with pytest.raises(BudaAPIError):
+                await breaker.call("btc-clp", failing)
+        assert breaker.state("btc-clp") == STATE_OPEN
+
+        monotonic.return_value = 1031.0
+        tasks = [asyncio.create_task(breaker.call("btc-clp", probe)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert calls == 1
+    assert results.count("ok") == 1
+    assert sum(isinstance(r, CircuitOpenError) for r in results) == 2
+    assert breaker.state("btc-clp") == STATE_CLOSED
+
 @pytest.mark.asyncio
 async def test_timeout_handling():
     """Test para manejo de timeouts."""
@@ -118,6 +174,152 @@ async def test_timeout_handling():
         
     await service.close()
 
+@pytest.mark.asyncio
+async def test_retries_transient_errors_but_not_404():
+    """Test para reintentar errores transitorios de Buda sin reintentar un 404."""
+    service = BudaService()
+    ok_response = MagicMock()
+    ok_response.content = json.dumps({"ticker": {"last_price": ["50000000.0"]}}).encode()
+    ok_response.raise_for_status = MagicMock()
+    unavailable = MagicMock()
+    unavailable.status_code = 503
+    not_found = MagicMock()
+    not_found.status_code = 404
+
+    with patch('app.services.buda_service.asyncio.sleep', new_callable=AsyncMock), \
+            patch.object(service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = [
+            httpx.HTTPStatusError("503", request=MagicMock(), response=unavailable),
+            httpx.ConnectError("Connection failed"),
+            ok_response
+        ]
+        ticker = await service.get_market_ticker("btc-clp")
+        assert ticker["ticker"]["last_price"][0] == "50000000.0"
+        assert mock_get.await_count == 3
+
+        mock_get.reset_mock()
+        mock_get.side_effect = httpx.HTTPStatusError("404", request=MagicMock(), response=not_found)
+        with pytest.raises(CurrencyNotFoundError):
+            await service.get_market_ticker("xxx-clp")
+        assert mock_get.await_count == 1
+
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_retries_stay_within_request_timeout():
+    """Test para verificar que los reintentos no exceden request_timeout en total."""
+    calls = 0
+
+    async def slow_handler(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(5)
+        return httpx.Response(200, json={"ticker": {"last_price": ["50000000.0"]}})
+
+    service = BudaService()
+    await service.client.aclose()
+    service.client = httpx.AsyncClient(base_url=settings.buda_api_url, transport=httpx.MockTransport(slow_handler))
+
+    with patch('app.services.buda_service.settings.request_timeout', 1.0), \
+            patch('app.services.buda_service.settings.buda_attempt_timeout', 0.4), \
+            patch('app.services.buda_service.settings.buda_retry_attempts', 5), \
+            patch('app.services.buda_service.settings.buda_retry_backoff_base', 0.01), \
+            patch('app.services.buda_service.settings.buda_retry_min_attempt_time', 0.1):
+        start = time.perf_counter()
+        with pytest.raises(BudaAPIError):
+            await service.get_market_ticker("btc-clp")
+        elapsed = time.perf_counter() - start
+
+    # Tres intentos completos de 0.4s excederían el presupuesto; el último se acorta
+    assert calls == 3
+    assert elapsed <= 1.0 + 0.05
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_hedged_request_when_first_attempt_is_slow():
+    """Test para lanzar una petición duplicada cuando la primera supera el percentil de latencia."""
+    service = BudaService()
+    for _ in range(service.latency.min_samples):
+        service.latency.record("ticker", 0.01)
+    ok_response = MagicMock()
+    ok_response.content = json.dumps({"ticker": {"last_price": ["50000000.0"]}}).encode()
+    ok_response.raise_for_status = MagicMock()
+    calls = 0
+
+    async def fake_get(path, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return ok_response
+
+    with patch.object(service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = fake_get
+        start = time.perf_counter()
+        ticker = await service.get_market_ticker("btc-clp")
+
+    assert ticker["ticker"]["last_price"][0] == "50000000.0"
+    assert calls == 2
+    assert time.perf_counter() - start < 1
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_upstream_rate_limiter_serves_users_first():
+    """Test para atender las llamadas de usuarios antes que el refresco y los health checks."""
+    limiter = UpstreamRateLimiter(rate=100, burst=1, max_wait=1)
+    await limiter.acquire()
+    served = []
+
+    async def call(priority):
+        await limiter.acquire(priority)
+        served.append(priority)
+
+    await asyncio.gather(
+        call(RequestPriority.HEALTH),
+        call(RequestPriority.BACKGROUND),
+        call(RequestPriority.USER)
+    )
+    assert served == [RequestPriority.USER, RequestPriority.BACKGROUND, RequestPriority.HEALTH]
+
+    # Sin tokens y con una espera máxima menor a la recarga, la llamada falla
+    limiter = UpstreamRateLimiter(rate=1, burst=1, max_wait=0.05)
+    await limiter.acquire()
+    with pytest.raises(UpstreamRateLimitError):
+        await limiter.acquire(RequestPriority.BACKGROUND)
+    await limiter.close()
+
+@pytest.mark.asyncio
+async def test_buda_rate_limit_headers_pause_calls_without_opening_breaker():
+    """Test para pausar las llamadas con los headers de límite de Buda sin abrir el circuit breaker."""
+    service = BudaService()
+    service.rate_limiter.update(200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "30"})
+    assert service.rate_limiter.bucket.tokens == 0
+    service.rate_limiter.max_wait = 0.05
+
+    with patch.object(service.client, 'get', new_callable=AsyncMock) as mock_get:
+        with pytest.raises(UpstreamRateLimitError):
+            await service.get_market_ticker("btc-clp")
+        # La pausa se respeta sin llamar a Buda
+        assert mock_get.await_count == 0
+
+    await service.rate_limiter.close()
+    service.rate_limiter = UpstreamRateLimiter(rate=10, burst=20, max_wait=0.05)
+    limited = MagicMock()
+    limited.status_code = 429
+    limited.headers = {"retry-after": "30"}
+    limited.raise_for_status.side_effect = httpx.HTTPStatusError("429", request=MagicMock(), response=limited)
+
+    with patch.object(service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = limited
+        for _ in range(settings.circuit_breaker_failure_threshold + 1):
+            with pytest.raises(UpstreamRateLimitError):
+                await service.get_market_ticker("btc-clp")
+        # Tras el 429 el resto de las llamadas esperan el Retry-After en lugar de insistir
+        assert mock_get.await_count == 1
+
+    assert buda_breaker.state("btc-clp") == STATE_CLOSED
+    await service.close()
+
 @pytest.mark.asyncio
 async def test_find_best_conversion_success(conversion_service):
     """Test para conversión exitosa."""
@@ -126,16 +328,16 @@ async def test_find_best_conversion_success(conversion_service):
         # Mock para simular tasas de conversión exitosas
         async def mock_get_rate(market):
             rates = {
-                "btc-clp": 50000000.0,
-                "btc-pen": 15000.0,
-                "eth-clp": 2000000.0,
-                "eth-pen": 600.0,
-                "ltc-clp": 1000000.0,
-                "ltc-pen": 300.0,
-                "bch-clp": 800000.0,
-                "bch-pen": 240.0
+                "btc-clp": Decimal("50000000.0"),
+                "btc-pen": Decimal("15000.0"),
+                "eth-clp": Decimal("2000000.0"),
+                "eth-pen": Decimal("600.0"),
+                "ltc-clp": Decimal("1000000.0"),
+                "ltc-pen": Decimal("300.0"),
+                "bch-clp": Decimal("800000.0"),
+                "bch-pen": Decimal("240.0")
             }
-            return rates.get(market, 1000000.0)
+            return rates.get(market, Decimal("1000000.0"))
         
         mock_rate.side_effect = mock_get_rate
         
@@ -145,7 +347,7 @@ async def test_find_best_conversion_success(conversion_service):
             1000000  # 1 millón de pesos chilenos
         )
         
-        assert isinstance(final_amount, float)
+        assert isinstance(final_amount, Decimal)
         assert final_amount > 0
         assert intermediate in [CryptoCurrency.BTC, CryptoCurrency.ETH, CryptoCurrency.LTC, CryptoCurrency.BCH]
 
@@ -198,4 +400,358 @@ async def test_conversion_no_valid_route(conversion_service):
                 FiatCurrency.PEN,
                 1000000
             )
-        assert "No se encontró una ruta de conversión válida" in str(exc_info.value) 
\ No newline at end of file
+        assert "No se encontró una ruta de conversión válida" in str(exc_info.value) 
+
+@pytest.mark.asyncio
+async def test_find_best_conversion_fetches_legs_concurrently(conversion_service):
+    """Test para verificar que las patas de las rutas se consultan en paralelo."""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def mock_get_rate(market):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if market.startswith("bch"):
+            raise CurrencyNotFoundError(f"Mercado {market} no encontrado")
+        return Decimal("1000.0") if market.endswith("clp") else Decimal("2.0")
+
+    with patch('app.services.conversion_service.ConversionService.get_conversion_rate') as mock_rate:
+        mock_rate.side_effect = mock_get_rate
+
+        final_amount, intermediate = await conversion_service.find_best_conversion("CLP", "PEN", 1000)
+
+        assert mock_rate.call_count == 8
+        assert max_in_flight > 1
+        assert final_amount == Decimal("2.0")
+        assert intermediate == CryptoCurrency.BTC
+
+@pytest.mark.asyncio
+async def test_concurrent_ticker_requests_are_coalesced():
+    """Test para verificar que llamadas concurrentes al mismo mercado comparten una petición."""
+    service = BudaService()
+
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "ticker": {
+            "last_price": ["50000000.0"]
+        }
+    }).encode()
+    mock_response.raise_for_status = MagicMock()
+
+    async def slow_get(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return mock_response
+
+    with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = slow_get
+
+        results = await asyncio.gather(*(service.get_market_ticker("eth-pen") for _ in range(5)))
+
+        assert all(result == results[0] for result in results)
+        assert mock_get.call_count == 1
+
+    await service.close()
+
+@pytest.mark.asyncio
+async def test_get_conversion_rate_from_price_table(conversion_service):
+    """Test para obtener tasas desde la tabla de tickers masiva."""
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "tickers": [
+            {"market_id": "BTC-CLP", "last_price": ["50000000.0", "CLP"]},
+            {"market_id": "ETH-CLP", "last_price": ["2000000.0", "CLP"]}
+        ]
+    }).encode()
+    mock_response.raise_for_status = MagicMock()
+
+    with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+
+        btc_rate = await conversion_service.get_conversion_rate("btc-clp")
+        eth_rate = await conversion_service.get_conversion_rate("eth-clp")
+
+        assert btc_rate == Decimal("50000000.0")
+        assert eth_rate == Decimal("2000000.0")
+        assert mock_get.call_count == 1
+        assert mock_get.call_args[0][0] == "/tickers"
+
+        with pytest.raises(CurrencyNotFoundError):
+            await conversion_service.get_conversion_rate("ltc-clp")
+
+@pytest.mark.asyncio
+async def test_price_refresher_bypasses_cache(buda_service):
+    """Test para verificar que el refresco en segundo plano actualiza el caché."""
+    refresher = PriceRefresher(buda_service)
+
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({
+        "tickers": [{"market_id": "BTC-CLP", "last_price": ["50000000.0", "CLP"]}]
+    }).encode()
+    mock_response.raise_for_status = MagicMock()
+
+    with patch('httpx.AsyncClient.get', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+
+        await buda_service.get_price_table()
+        await refresher.refresh()
+        assert mock_get.call_count == 2
+
+        refresher.start()
+        assert refresher.is_running
+        await refresher.stop()
+        assert not refresher.is_running
+
+@pytest.mark.asyncio
+async def test_find_best_conversion_uses_rate_matrix(conversion_service):
+    """Test para verificar que la matriz precalculada evita consultar las patas."""
+    conversion_service.update_rate_matrix({
+        "fetched_at": time.time(),
+        "prices": {
+            "btc-clp": Decimal("50000000.0"),
+            "btc-pen": Decimal("15000.0"),
+            "eth-clp": Decimal("2000000.0"),
+            "eth-pen": Decimal("700.0")
+        }
+    })
+
+    with patch('app.services.conversion_service.ConversionService.get_conversion_rate') as mock_rate:
+        final_amount, intermediate = await conversion_service.find_best_conversion(
+            FiatCurrency.CLP,
+            FiatCurrency.PEN,
+            1000000
+        )
+
+        mock_rate.assert_not_called()
+        assert intermediate == CryptoCurrency.ETH
+        assert final_amount == Decimal("350")
+
+@pytest.mark.asyncio
+async def test_rate_matrix_not_used_with_expired_snapshot(conversion_service):
+    """Test para verificar que un snapshot expirado no se sirve desde la matriz."""
+    expired_table = {
+        "fetched_at": time.time() - 100,
+        "prices": {"btc-clp": Decimal("50000000.0"), "btc-pen": Decimal("15000.0")}
+    }
+    conversion_service.update_rate_matrix(expired_table)
+    # Releer el mismo snapshot no debe rejuvenecer la matriz
+    conversion_service.update_rate_matrix(dict(expired_table))
+
+    with patch('app.services.conversion_service.ConversionService.get_conversion_rate') as mock_rate:
+        async def mock_get_rate(market):
+            return Decimal("1000.0") if market.endswith("clp") else Decimal("2.0")
+
+        mock_rate.side_effect = mock_get_rate
+
+        await conversion_service.find_best_conversion(FiatCurrency.CLP, FiatCurrency.PEN, 1000)
+
+        assert mock_rate.call_count == 8
+
+@pytest.mark.asyncio
+async def test_find_best_conversion_with_order_book_depth(conversion_service):
+    """Test para verificar que en modo order_book se elige el mayor monto ejecutable."""
+    books = {
+        "btc-clp": {"order_book": {"asks": [["50000000.0", "0.01"], ["60000000.0", "1.0"]], "bids": []}},
+        "btc-pen": {"order_book": {"asks": [], "bids": [["15000.0", "1.0"]]}},
+        "eth-clp": {"order_book": {"asks": [["2000000.0", "10.0"]], "bids": []}},
+        "eth-pen": {"order_book": {"asks": [], "bids": [["700.0", "0.1"], ["600.0", "10.0"]]}}
+    }
+
+    async def mock_get_order_book(market_id):
+        if market_id not in books:
+            raise CurrencyNotFoundError(f"Mercado {market_id} no encontrado", {"market_id": market_id})
+        return books[market_id]
+
+    with patch('app.services.conversion_service.settings.pricing_mode', "order_book"), \
+            patch.object(conversion_service.buda_service, 'get_order_book', side_effect=mock_get_order_book):
+        final_amount, intermediate = await conversion_service.find_best_conversion(
+            FiatCurrency.CLP,
+            FiatCurrency.PEN,
+            1000000
+        )
+        depth = conversion_service._depth_indexes["eth-clp"][1]
+
+        # BTC: 0.01 + 500000 / 60000000 BTC -> 275 PEN; ETH: 0.5 ETH -> 70 + 0.4 * 600 PEN
+        assert intermediate == CryptoCurrency.ETH
+        assert final_amount == Decimal("310")
+
+        # Un monto mayor a la profundidad disponible no tiene ruta válida
+        with pytest.raises(ConversionError):
+            await conversion_service.find_best_conversion(FiatCurrency.CLP, FiatCurrency.PEN, 10 ** 12)
+
+        # El índice de profundidad se reutiliza mientras el libro no cambie
+        assert conversion_service._depth_indexes["eth-clp"][1] is depth
+
+@pytest.mark.asyncio
+async def test_graph_route_engine_finds_multi_hop_route(conversion_service):
+    """Test para verificar que el motor graph encuentra rutas de varios saltos con bid/ask."""
+    markets = {"markets": [
+        {"id": "BTC-CLP", "base_currency": "BTC", "quote_currency": "CLP"},
+        {"id": "BTC-USDC", "base_currency": "BTC", "quote_currency": "USDC"},
+        {"id": "USDC-PEN", "base_currency": "USDC", "quote_currency": "PEN"},
+        {"id": "ETH-CLP", "base_currency": "ETH", "quote_currency": "CLP"},
+        {"id": "ETH-PEN", "base_currency": "ETH", "quote_currency": "PEN"}
+    ]}
+    price_table = {
+        "fetched_at": time.time(),
+        "prices": {"btc-clp": Decimal("49000000.0"), "btc-usdc": Decimal("61000.0"), "usdc-pen": Decimal("3.9"), "eth-clp": Decimal("1900000.0"), "eth-pen": Decimal("810.0")},
+        "bids": {"btc-usdc": Decimal("60000.0"), "usdc-pen": Decimal("3.8"), "eth-pen": Decimal("800.0")},
+        "asks": {"btc-clp": Decimal("50000000.0"), "eth-clp": Decimal("2000000.0")}
+    }
+
+    with patch('app.services.conversion_service.settings.route_engine', "graph"), \
+            patch.object(conversion_service.buda_service, 'get_available_markets', new_callable=AsyncMock) as mock_markets, \
+            patch.object(conversion_service.buda_service, 'get_price_table', new_callable=AsyncMock) as mock_table:
+        mock_markets.return_value = markets
+        mock_table.return_value = price_table
+
+        rate, route = await conversion_service.find_best_route(FiatCurrency.CLP, FiatCurrency.PEN)
+        assert list(route) == ["CLP", "BTC", "USDC", "PEN"]
+        assert route.value == "BTC-USDC"
+        assert rate == Decimal("60000.0") * Decimal("3.8") / Decimal("50000000.0")
+
+        graph = conversion_service._graph[1]
+        with patch('app.services.conversion_service.settings.route_max_hops', 2):
+            conversion_service._graph_routes.clear()
+            final_amount, route = await conversion_service.find_best_conversion(FiatCurrency.CLP, FiatCurrency.PEN, 1000000)
+
+        assert list(route) == ["CLP", "ETH", "PEN"]
+        assert final_amount == Decimal("400")
+        # El grafo se reutiliza mientras no cambie la lista de mercados
+        assert conversion_service._graph[1] is graph
+
+@pytest.mark.asyncio
+async def test_readiness_reads_health_state_without_calling_buda(buda_service):
+    """Test para verificar que el readiness probe es una lectura en memoria."""
+    health_service = HealthService(buda_service)
+    is_ready, dependencies, _, _ = await health_service.check_readiness()
+    assert not is_ready
+    assert dependencies == {"buda_api": "unknown", "cache": "unknown"}
+
+    mock_response = MagicMock()
+    mock_response.content = json.dumps({"markets": []}).encode()
+    mock_response.raise_for_status = MagicMock()
+
+    with patch.object(buda_service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+
+        await health_service.refresh()
+        for _ in range(10):
+            is_ready, dependencies, checks_passed, checks_total = await health_service.check_readiness()
+        assert is_ready
+        assert checks_passed == checks_total == 2
+
+        # El tráfico reciente hacia Buda evita que el chequeo en segundo plano lo consulte
+        await health_service.refresh()
+        assert mock_get.call_count == 1
+
+        with patch('time.time', return_value=time.time() + 120):
+            _, dependencies, _, _ = await health_service.check_readiness()
+        assert dependencies["buda_api"] == "stale"
+
+@pytest.mark.asyncio
+async def test_rate_broadcaster_publishes_changes_and_drops_oldest():
+    """Test para la difusión de tasas: una consulta por par, publicación solo al cambiar y colas acotadas."""
+    rates = {
+        (FiatCurrency.CLP, FiatCurrency.PEN): (Decimal("0.0042"), CryptoCurrency.BTC),
+        (FiatCurrency.COP, FiatCurrency.CLP): (Decimal("0.23"), CryptoCurrency.ETH)
+    }
+    conversion_service = MagicMock()
+    conversion_service.find_best_route = AsyncMock(side_effect=lambda from_currency, to_currency: rates[(from_currency, to_currency)])
+
+    with patch('app.services.rate_stream.settings.rate_stream_queue_size', 2):
+        broadcaster = RateBroadcaster(conversion_service)
+        only_clp_pen = broadcaster.subscribe([(FiatCurrency.CLP, FiatCurrency.PEN)])
+        both = broadcaster.subscribe([(FiatCurrency.CLP, FiatCurrency.PEN), (FiatCurrency.COP, FiatCurrency.CLP)])
+    await broadcaster.stop()
+
+    assert await broadcaster.publish_changes() == 2
+    assert conversion_service.find_best_route.await_count == 2
+    assert only_clp_pen.queue.qsize() == 1
+    assert both.queue.qsize() == 2
+
+    # Sin cambios no se publica nada
+    assert await broadcaster.publish_changes() == 0
+
+    # Un consumidor lento conserva solo los eventos más recientes
+    for price in ("0.0043", "0.0044"):
+        rates[(FiatCurrency.CLP, FiatCurrency.PEN)] = (Decimal(price), CryptoCurrency.BTC)
+        assert await broadcaster.publish_changes() == 1
+    assert both.dropped == 2
+    events = [json.loads(both.queue.get_nowait()) for _ in range(2)]
+    assert [event["rate"] for event in events] == ["0.0043", "0.0044"]
+    assert events[-1]["route"] == ["CLP", "BTC", "PEN"]
+
+    # Un suscriptor nuevo recibe de inmediato la última tasa conocida
+    late = broadcaster.subscribe([(FiatCurrency.COP, FiatCurrency.CLP)])
+    assert json.loads(late.queue.get_nowait())["rate"] == "0.23"
+
+    for subscription in (only_clp_pen, both, late):
+        broadcaster.unsubscribe(subscription)
+    assert broadcaster.subscriber_count == 0
+    assert not broadcaster.is_running
+
+@pytest.mark.asyncio
+async def test_market_registry_routes_only_existing_markets(conversion_service):
+    """Test para el registro de mercados cargado desde /markets."""
+    markets = {"markets": [
+        {"id": "BTC-CLP", "base_currency": "BTC", "quote_currency": "CLP"},
+        {"id": "BTC-ARS", "base_currency": "BTC", "quote_currency": "ARS"},
+        {"id": "ETH-CLP", "base_currency": "ETH", "quote_currency": "CLP"},
+        {"id": "ETH-BTC", "base_currency": "ETH", "quote_currency": "BTC"}
+    ]}
+    mock_response = MagicMock()
+    mock_response.content = json.dumps(markets).encode()
+    mock_response.raise_for_status = MagicMock()
+
+    with patch.object(conversion_service.buda_service.client, 'get', new_callable=AsyncMock) as mock_get:
+        mock_get.return_value = mock_response
+        registry = await MarketRegistryRefresher(conversion_service.buda_service).refresh()
+
+    # BTC cotiza contra ETH, así que no es fiat; ETH no tiene mercado en ARS
+    assert registry is get_market_registry()
+    assert registry.fiats == {"CLP", "ARS"}
+    assert registry.cryptos == ("BTC", "ETH")
+    assert registry.routes("CLP", "ARS") == (("BTC", "btc-clp", "btc-ars"),)
+    assert registry.candidate_markets("ARS", "CLP") == ("btc-ars", "btc-clp")
+
+    # La validación de solicitudes usa el registro
+    assert ConversionRequest(from_currency="ars", to_currency="CLP", amount=Decimal("10")).from_currency == "ARS"
+    with pytest.raises(ValueError):
+        ConversionRequest(from_currency="PEN", to_currency="CLP", amount=Decimal("10"))
+
+    prices = {"btc-clp": Decimal("50000000"), "btc-ars": Decimal("60000000")}
+    with patch.object(conversion_service, 'get_conversion_rate', new_callable=AsyncMock) as mock_rate:
+        mock_rate.side_effect = lambda market_id: prices[market_id]
+        amount, intermediate = await conversion_service.find_best_conversion("ARS", "CLP", Decimal("600"))
+
+    assert amount == Decimal("500")
+    assert intermediate == "BTC"
+    assert sorted(call.args[0] for call in mock_rate.await_args_list) == ["btc-ars", "btc-clp"]
+
+@pytest.mark.asyncio
+async def test_missing_markets_are_skipped_until_expiry(conversion_service):
+    """Test para no consultar mercados que respondieron 404 mientras la marca esté vigente."""
+    prices = {"btc-clp": Decimal("50000000"), "btc-pen": Decimal("15000")}
+
+    async def fake_rate(market_id):
+        if market_id not in prices:
+            raise CurrencyNotFoundError(f"Mercado {market_id} no encontrado", {"market_id": market_id})
+        return prices[market_id]
+
+    with patch.object(conversion_service, 'get_conversion_rate', new_callable=AsyncMock) as mock_rate, \
+            patch('app.services.conversion_service.settings.use_bulk_tickers', False):
+        mock_rate.side_effect = fake_rate
+        for _ in range(2):
+            amount, intermediate = await conversion_service.find_best_conversion(
+                FiatCurrency.CLP, FiatCurrency.PEN, Decimal("50000000")
+            )
+            assert amount == Decimal("15000")
+            assert intermediate == CryptoCurrency.BTC
+        # Solo la primera conversión consultó los mercados inexistentes
+        assert mock_rate.await_count == 8 + 2
+
+        with patch('app.services.market_registry.time.time', return_value=time.time() + settings.cache_negative_ttl + 1):
+            assert conversion_service.availability.is_available("eth-clp")